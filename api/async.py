@@ -1,10 +1,28 @@
 import aiohttp
+import argparse
 import asyncio
-import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 from pathlib import Path
 import os
 import time
+import zlib
+from price_history import (LOOKBACK_DAYS, as_date, split_date_range, history_to_series, resolve_prices,
+                           pivot_history, matrix_row_to_series)
+from trading_calendar import TradingCalendar
+from concurrency import AdaptiveLimiter, HedgePolicy, TokenBucket, backoff_delay
+from response_cache import DEFAULT_CACHE_DIR, ResponseCache
+from price_store import DEFAULT_STORE_PATH, PriceStore
+from result_writer import StreamingResultWriter
+from fetch_metrics import FetchMetrics
+from fetch_journal import DEFAULT_JOURNAL_PATH, FetchJournal
+from sharding import parse_shard, shard_funds, shard_output_path, shard_tag
+from tefas_parser import PriceHistory, parse_response
+from fund_liveness import DEFAULT_LIVENESS_PATH, RECHECK_DAYS, FundLiveness
+from fetch_schedule import PARTIAL_DIR_NAME, PRIORITY_HEDGE, PRIORITY_REST, FetchSchedule, PartialResults
+
+# Funds whose stored history ends at most this many days ago are refreshed together in one bulk delta request
+DELTA_BULK_MAX_DAYS = 14
 
 # Function to get the previous Friday's date
 def get_previous_friday(date):
@@ -12,9 +30,94 @@ def get_previous_friday(date):
         date -= timedelta(days=1)
     return date
 
+# BindHistoryInfo endpoint; TEFAS_URL points the fetcher at a local stand-in server
+TEFAS_URL = os.environ.get('TEFAS_URL', 'https://www.tefas.gov.tr/api/DB/BindHistoryInfo')
+
+# Seconds before an attempt times out, unless --hedge derives it from live latencies
+REQUEST_TIMEOUT = 20
+
+# On-disk response cache shared by all requests; set up in fetch_results()
+response_cache = None
+
+# Request metrics of the current run; replaced in fetch_results()
+fetch_metrics = FetchMetrics()
+
+# Hedging, adaptive timeouts and the retry budget of --hedge; set up in fetch_results()
+hedging = None
+
+# First and last trading dates of every fund, used to skip requests that cannot return a price; set up in fetch_results()
+liveness = None
+
+# One POST for payload under a limiter slot, returning the parsed response. Errors are counted
+# and re-raised; sent (if given) is set once the request has left the queue.
+async def post_history(session, payload, fund_code, start_date, limiter, priority, attempt, sent_event=None):
+    timeout = REQUEST_TIMEOUT if hedging is None else hedging.attempt_timeout()
+    sent = None
+    try:
+        queued = time.monotonic()
+        async with limiter.slot(priority):
+            sent = time.monotonic()
+            fetch_metrics.observe_wait(sent - queued)
+            if sent_event is not None:
+                sent_event.set()
+            async with session.post(TEFAS_URL, data=payload, timeout=timeout) as response:
+                body = await response.read()
+                latency = time.monotonic() - sent
+                fetch_metrics.observe_response(response.status, latency, len(body))
+                sent = None  # the response is counted; errors raised from here on are not request errors
+                if 400 <= response.status <= 599:
+                    text = await response.text()
+                    print(f"[HTTP {response.status}] Error for fund {fund_code} on {start_date.strftime('%Y-%m-%d')}: {text.strip()} (attempt {attempt+1})", flush=True)
+                    raise aiohttp.ClientResponseError(
+                        status=response.status,
+                        request_info=response.request_info,
+                        history=response.history
+                    )
+                if hedging is not None:
+                    hedging.observe(latency)
+                return parse_response(body)
+    except Exception as e:
+        if sent is not None:
+            fetch_metrics.observe_error(e, time.monotonic() - sent)
+        raise
+
+# Hedged attempt: once the request has been on the wire longer than the recent p95 latency, send a
+# duplicate (if the retry budget allows) ahead of every queued request and keep whichever succeeds first
+async def hedged_request(make_request):
+    first_sent = asyncio.Event()
+    sent_wait = asyncio.ensure_future(first_sent.wait())
+    tasks = [asyncio.ensure_future(make_request(sent_event=first_sent))]
+    try:
+        await asyncio.wait([tasks[0], sent_wait], return_when=asyncio.FIRST_COMPLETED)
+        delay = hedging.hedge_delay()
+        if not tasks[0].done() and delay is not None:
+            await asyncio.wait(tasks, timeout=delay)
+            if not tasks[0].done():
+                if hedging.try_hedge():
+                    fetch_metrics.hedges += 1
+                    tasks.append(asyncio.ensure_future(make_request(hedge=True)))
+                else:
+                    fetch_metrics.budget_denied += 1
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not tasks[0]:
+                        fetch_metrics.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        sent_wait.cancel()
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
 # Async function to fetch fund data with retry and concurrency control
-async def fetch_fund_data(session, fund_code, start_date, end_date, semaphore, retries=3):
-    url = 'https://www.tefas.gov.tr/api/DB/BindHistoryInfo'
+async def fetch_fund_data(session, fund_code, start_date, end_date, limiter, retries=3, priority=PRIORITY_REST):
     payload = {
         'fontip': 'YAT',
         'sfontur': '',
@@ -25,97 +128,371 @@ async def fetch_fund_data(session, fund_code, start_date, end_date, semaphore, r
         'fonturkod': '',
         'fonunvantip': ''
     }
+    if response_cache is not None:
+        cached = response_cache.get_columns(payload)
+        if cached is not None:
+            fetch_metrics.cache_hits += 1
+            history = PriceHistory.from_columns(*cached)
+            if liveness is not None:
+                liveness.observe(fund_code, start_date, end_date, history)
+            return history
+
+    if hedging is not None:
+        hedging.budget.deposit()
     for attempt in range(retries):
+        def attempt_request(sent_event=None, hedge=False):
+            return post_history(session, payload, fund_code, start_date, limiter,
+                                PRIORITY_HEDGE if hedge else priority, attempt, sent_event)
+
         try:
-            async with semaphore:
-                async with session.post(url, data=payload, timeout=20) as response:
-                    if 400 <= response.status <= 599:
-                        text = await response.text()
-                        print(f"[HTTP {response.status}] Error for fund {fund_code} on {start_date.strftime('%Y-%m-%d')}: {text.strip()} (attempt {attempt+1})", flush=True)
-                        raise aiohttp.ClientResponseError(
-                            status=response.status,
-                            request_info=response.request_info,
-                            history=response.history
-                        )
-                    data = await response.json()
-                    return pd.DataFrame(data['data'])
+            history = await (attempt_request() if hedging is None else hedged_request(attempt_request))
+            if response_cache is not None:
+                response_cache.put_columns(payload, *history.to_columns())
+            if liveness is not None:
+                liveness.observe(fund_code, start_date, end_date, history)
+            return history
         except (aiohttp.ClientResponseError, aiohttp.ClientConnectorError, asyncio.TimeoutError) as e:
             print(f"[Error] Fund {fund_code} ({start_date.strftime('%Y-%m-%d')}) attempt {attempt+1}: {str(e)}", flush=True)
         except Exception as e:
             print(f"[Unknown Error] Fund {fund_code} ({start_date.strftime('%Y-%m-%d')}) attempt {attempt+1}: {str(e)}", flush=True)
 
         if attempt < retries - 1:
-            await asyncio.sleep(2 ** attempt)
+            if hedging is not None and not hedging.budget.try_spend():
+                fetch_metrics.budget_denied += 1
+                break
+            delay = backoff_delay(attempt)
+            fetch_metrics.observe_retry(delay)
+            await asyncio.sleep(delay)
+    fetch_metrics.failures += 1
     print(f"[Failed] Fund {fund_code} ({start_date.strftime('%Y-%m-%d')}): All retries failed.", flush=True)
-    return pd.DataFrame()
+    return PriceHistory.empty()
+
+# Async function to fetch a fund's history over an arbitrary range, split into chunks TEFAS accepts
+async def fetch_fund_history(session, fund_code, start_date, end_date, limiter, priority=PRIORITY_REST):
+    tasks = [fetch_fund_data(session, fund_code, chunk_start, chunk_end, limiter, priority=priority)
+             for chunk_start, chunk_end in split_date_range(start_date, end_date)]
+    return PriceHistory.concat(await asyncio.gather(*tasks))
 
 # Shared counter and timer for progress tracking
 fetched_prices_counter = 0
 start_time = time.time()
 
-# Async function to get single day price
-async def get_single_day_price(session, date, fund_code, semaphore, total_prices):
+def report_progress(total, unit='prices', every=200):
     global fetched_prices_counter, start_time
-    df = await fetch_fund_data(session, fund_code, date, date, semaphore)
-    if not df.empty:
-        price = df['FIYAT'].astype(float).iloc[0]
-        price = f"{price:.3f}"
-        full_fund_name = df['FONUNVAN'].iloc[0]
-        fetched_prices_counter += 1
-        if fetched_prices_counter % 200 == 0 or fetched_prices_counter == total_prices:
-            elapsed = time.time() - start_time
-            elapsed_str = time.strftime("%H:%M:%S", time.gmtime(elapsed))
-            progress = (fetched_prices_counter / total_prices) * 100
-            print(f"Fetched {fetched_prices_counter}/{total_prices} prices ({progress:.2f}%) - {elapsed_str} elapsed", flush=True)
+    fetched_prices_counter += 1
+    if fetched_prices_counter % every == 0 or fetched_prices_counter == total:
+        elapsed = time.time() - start_time
+        elapsed_str = time.strftime("%H:%M:%S", time.gmtime(elapsed))
+        progress = (fetched_prices_counter / total) * 100
+        print(f"Fetched {fetched_prices_counter}/{total} {unit} ({progress:.2f}%) - {elapsed_str} elapsed", flush=True)
+
+# Async function to get single day price
+async def get_single_day_price(session, date, fund_code, limiter, total_prices, priority=PRIORITY_REST):
+    if liveness is not None and not liveness.allows(fund_code, date):
+        return None, None
+    history = await fetch_fund_data(session, fund_code, date, date, limiter, priority=priority)
+    if len(history):
+        price = float(history.prices[0])
+        full_fund_name = history.names[0]
+        report_progress(total_prices)
         return price, full_fund_name
     else:
         return None, None
 
-# Async function to get the most recent price
-async def get_recent_price_from_date(session, fund_code, base_date, semaphore, total_prices):
-    for days_back in range(3):
-        date_to_check = base_date - timedelta(days=days_back)
-        price, _ = await get_single_day_price(session, date_to_check, fund_code, semaphore, total_prices)
+# Async function to get the most recent price, probing only the last few trading days
+async def get_recent_price_from_date(session, fund_code, base_date, limiter, total_prices, calendar, skip=0,
+                                     priority=PRIORITY_REST):
+    for date_to_check in calendar.previous_trading_days(base_date, LOOKBACK_DAYS)[skip:]:
+        price, _ = await get_single_day_price(session, date_to_check, fund_code, limiter, total_prices, priority)
         if price is not None:
             return price
     return None
 
-async def process_fund(session, fund, today, week_dates, number_of_weeks, semaphore, total_prices):
+# Pack a fund's today price and weekly start prices into one float64 row (NaN where missing)
+def build_fund_row(fund, full_fund_name, today_price, start_prices):
+    prices = np.array([today_price] + list(start_prices), dtype=np.float64)
+    return fund, full_fund_name, prices
+
+# Resolve today's price and every weekly start price locally from a fund's {date: price} series
+def build_fund_row_from_series(fund, full_fund_name, series, today, week_dates, calendar):
+    prices = resolve_prices(series, [today] + week_dates, calendar)
+    return build_fund_row(fund, full_fund_name, prices[0], prices[1:])
+
+# Daily mode: one request per fund per date, each mapped to a trading day before it goes out.
+# Today's price and the weeks the configurations use are fetched first and passed to partial
+# (other weeks NaN); the rest of the weekly grid follows.
+async def process_fund(session, fund, today, week_dates, number_of_weeks, limiter, total_prices, calendar,
+                       schedule, partial=None):
+    async def week_price(week):
+        priority = schedule.week_priority(fund, week)
+        if week == 0:
+            return await get_recent_price_from_date(session, fund, today, limiter, total_prices, calendar,
+                                                    priority=priority), None
+        date = week_dates[week - 1]
+        price, name = await get_single_day_price(session, calendar.previous_trading_day(date), fund, limiter,
+                                                 total_prices, priority)
+        if price is None:
+            price = await get_recent_price_from_date(session, fund, date, limiter, total_prices, calendar, skip=1,
+                                                     priority=priority)
+        return price, name
+
+    reported = False
     try:
-        weekly_profits = []
-        weekly_prices = []
-        full_fund_name = ''
-        today_price = await get_recent_price_from_date(session, fund, today, semaphore, total_prices)
-
-        tasks = [get_single_day_price(session, date, fund, semaphore, total_prices) for date in week_dates]
-        results = await asyncio.gather(*tasks)
-
-        for week, (start_price, name) in enumerate(results, 1):
-            if week == 1 and name:
-                full_fund_name = name
-
-            if start_price is None:
-                date = week_dates[week - 1]
-                start_price = await get_recent_price_from_date(session, fund, date, semaphore, total_prices)
-
-            if start_price is not None:
-                weekly_prices.append(start_price)
-                if today_price is not None and float(start_price) != 0:
-                    profit_percentage = ((float(today_price) - float(start_price)) / float(start_price)) * 100
-                    profit_percentage = f"{profit_percentage:.3f}"
-                    weekly_profits.append(profit_percentage)
-                else:
-                    weekly_profits.append('None')
-            else:
-                weekly_profits.append('None')
-                weekly_prices.append('None')
+        prices = [None] * (number_of_weeks + 1)
+        names = [None] * (number_of_weeks + 1)
+        for weeks in (schedule.priority_weeks, schedule.other_weeks):
+            for week, (price, name) in zip(weeks, await asyncio.gather(*(week_price(week) for week in weeks))):
+                prices[week], names[week] = price, name
+            if partial is not None and not reported:
+                partial.add(build_fund_row(fund, next((name for name in names if name), ''), prices[0], prices[1:]))
+                reported = True
 
-        return fund, full_fund_name, today_price, weekly_profits, weekly_prices
+        return build_fund_row(fund, names[1] or '', prices[0], prices[1:])
 
     except Exception:
-        return fund, '', 'None', ['None']*number_of_weeks, ['None']*number_of_weeks
+        if partial is not None and not reported:
+            partial.add((fund, '', np.full(number_of_weeks + 1, np.nan)))
+        return fund, '', np.full(number_of_weeks + 1, np.nan)
+
+# Range mode: fetch the fund's whole daily history in a few chunked requests and resolve every date locally
+async def process_fund_range(session, fund, today, week_dates, number_of_weeks, limiter, total_funds, calendar,
+                             schedule):
+    try:
+        history_start = calendar.earliest_acceptable_day(week_dates[-1], LOOKBACK_DAYS)
+        window = (history_start, today) if liveness is None else liveness.clamp(fund, history_start, today)
+        history = PriceHistory.empty()
+        if window is not None:
+            history = await fetch_fund_history(session, fund, *window, limiter, priority=schedule.fund_priority(fund))
+        series, full_fund_name = history_to_series(history)
+        report_progress(total_funds, unit='funds', every=50)
+        return build_fund_row_from_series(fund, full_fund_name, series, today, week_dates, calendar)
+
+    except Exception:
+        return fund, '', np.full(number_of_weeks + 1, np.nan)
+
+# Bulk mode: one request per anchor window with an empty fonkod, returning every fund at once
+async def fetch_all_funds_for_dates(session, dates, limiter, calendar, schedule):
+    async def fetch_window(week, date):
+        window_start = calendar.earliest_acceptable_day(date, LOOKBACK_DAYS)
+        history = await fetch_fund_history(session, '', window_start, date, limiter, priority=schedule.date_priority(week))
+        return window_start, date, history
+
+    tasks = [fetch_window(week, date) for week, date in enumerate(dates)]
+    histories = []
+    for future in asyncio.as_completed(tasks):
+        window_start, window_end, history = await future
+        if len(history):
+            histories.append(history)
+            # A non-empty all-funds response covers the whole window, so days missing from it are not trading days
+            calendar.add_observed_days(history.unique_dates(), window_start, window_end)
+        report_progress(len(tasks), unit='dates', every=10)
+    return pivot_history(PriceHistory.concat(histories))
+
+# Pick the funds we track out of the bulk price matrix
+def process_bulk_results(price_matrix, fund_names, all_funds, today, week_dates, calendar):
+    for fund in all_funds:
+        code = fund.strip().upper()
+        series = matrix_row_to_series(price_matrix, code)
+        yield build_fund_row_from_series(fund, fund_names.get(code, ''), series, today, week_dates, calendar)
 
-async def main():
+# Update mode: fetch only the days after each fund's last stored trading day
+async def update_price_store(session, store, all_funds, history_start, today, limiter, schedule):
+    last_dates = store.last_dates()
+    today_date = as_date(today)
+
+    # Funds with a recent history share one bulk delta request; new or long-stale funds are backfilled one by one
+    recent_funds = {}
+    stale_funds = []
+    for fund in all_funds:
+        last_date = last_dates.get(fund)
+        if last_date is not None and (today_date - last_date).days <= DELTA_BULK_MAX_DAYS:
+            if last_date < today_date:
+                recent_funds[fund] = last_date
+        else:
+            stale_funds.append(fund)
+
+    if recent_funds:
+        delta_start = min(recent_funds.values()) + timedelta(days=1)
+        print(f"Fetching delta from {delta_start.strftime('%Y-%m-%d')} for {len(recent_funds)} funds", flush=True)
+        history = await fetch_fund_history(session, '', delta_start, today, limiter)
+        price_matrix, fund_names = pivot_history(history)
+        for fund, last_date in recent_funds.items():
+            code = fund.strip().upper()
+            series = {day: price for day, price in matrix_row_to_series(price_matrix, code).items() if day > last_date}
+            store.save_history(fund, series, fund_names.get(code, ''))
+
+    async def backfill(fund):
+        last_date = last_dates.get(fund)
+        start_date = as_date(history_start)
+        if last_date is not None and last_date >= start_date:
+            start_date = last_date + timedelta(days=1)
+        window = (start_date, today) if liveness is None else liveness.clamp(fund, start_date, today)
+        if window is not None:
+            history = await fetch_fund_history(session, fund, *window, limiter, priority=schedule.fund_priority(fund))
+            series, full_fund_name = history_to_series(history)
+            store.save_history(fund, series, full_fund_name)
+        report_progress(len(stale_funds), unit='funds', every=50)
+
+    if stale_funds:
+        print(f"Backfilling history for {len(stale_funds)} funds", flush=True)
+        await asyncio.gather(*(backfill(fund) for fund in stale_funds))
+
+# Build every fund's row from the local price store
+def process_store_results(store, all_funds, history_start, today, week_dates, calendar):
+    trading_days = store.trading_days()
+    if trading_days:
+        calendar.add_observed_days(trading_days, trading_days[0], trading_days[-1])
+
+    for fund in all_funds:
+        series = store.load_series(fund, history_start)
+        yield build_fund_row_from_series(fund, store.full_name(fund) or '', series, today, week_dates, calendar)
+
+# Add the fetch options to a parser; shared with pipeline.py
+def add_fetch_arguments(parser):
+    parser.add_argument('--mode', choices=['range', 'bulk', 'update', 'daily'], default='range',
+                        help="'range' fetches each fund's full history in chunked range requests (default); "
+                             "'bulk' fetches all funds at once for each weekly date; "
+                             "'update' fetches only new days into the local price store and builds the output from it; "
+                             "'daily' requests every fund and date separately")
+    parser.add_argument('--concurrency', type=int, default=15,
+                        help='initial number of in-flight requests; adapted up or down during the run')
+    parser.add_argument('--max-concurrency', type=int, default=64,
+                        help='upper bound for the adaptive in-flight request limit')
+    parser.add_argument('--rps', type=float, default=0,
+                        help='global requests-per-second cap (0 disables it)')
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR,
+                        help='directory of the on-disk TEFAS response cache')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always go to the network and do not cache responses')
+    parser.add_argument('--no-columnar', action='store_true',
+                        help='skip the typed Parquet copies of the CSV outputs')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH,
+                        help='SQLite price store used by --mode update')
+    parser.add_argument('--shard', type=parse_shard, default=None, metavar='i/N',
+                        help='fetch only shard i of N (a stable hash split of fund_names.txt) into the shards/ '
+                             'directory; combine the N shards with merge_shards.py (not supported with --mode bulk)')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted run of the same day: funds already in the journal are not fetched again. '
+                             '--mode update journals rows only once every delta is stored, so it resumes from the price store, '
+                             'which keeps each fund as soon as its delta lands')
+    parser.add_argument('--journal', type=Path, default=DEFAULT_JOURNAL_PATH,
+                        help='checkpoint journal of finished funds used by --resume')
+    parser.add_argument('--liveness', type=Path, default=DEFAULT_LIVENESS_PATH,
+                        help='registry of each fund\'s first and last trading dates, used to skip requests for '
+                             'delisted or not yet launched funds')
+    parser.add_argument('--no-liveness', action='store_true',
+                        help='request every fund and date regardless of the liveness registry')
+    parser.add_argument('--recheck-days', type=int, default=RECHECK_DAYS,
+                        help='request delisted and never-listed funds in full again after this many days')
+    parser.add_argument('--hedge', action='store_true',
+                        help='send a duplicate of any request still running after the recent p95 latency and keep the '
+                             'first answer; attempt timeouts follow live latencies and retries and duplicates share '
+                             'the --retry-budget')
+    parser.add_argument('--retry-budget', type=float, default=0.05,
+                        help='with --hedge, retries plus duplicates allowed as a share of requests (default: %(default)s)')
+    parser.add_argument('--no-partial', action='store_true',
+                        help='do not write the early partial outputs (portfolio funds, or today and the configured weeks '
+                             'in daily mode) to the partial/ directory')
+    parser.add_argument('--metrics', type=Path, default=None,
+                        help='write request metrics here at the end of the run (Prometheus text for .prom/.txt, JSON otherwise)')
+    parser.add_argument('--metrics-interval', type=float, default=0,
+                        help='print a metrics line (and refresh --metrics) every this many seconds during the run (0 disables it)')
+    return parser
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Fetch TEFAS fund prices and weekly profit percentages.')
+    return add_fetch_arguments(parser).parse_args(argv)
+
+# Fetch prices for every fund with the selected mode, producing one (fund, full name, prices) row per fund.
+# Rows are passed to on_result as they complete, or collected and returned when no callback is given.
+async def fetch_results(args, all_funds, today, week_dates, trace_configs=None, on_result=None, liveness_path=None,
+                        on_partial=None):
+    global response_cache, fetch_metrics, liveness, hedging
+    results = []
+    emit = on_result if on_result is not None else results.append
+
+    response_cache = None if args.no_cache else ResponseCache(args.cache_dir)
+    liveness = None if args.no_liveness else FundLiveness(liveness_path or args.liveness, today, args.recheck_days)
+    hedging = HedgePolicy(budget_ratio=args.retry_budget, max_timeout=REQUEST_TIMEOUT) if args.hedge else None
+
+    rate_limiter = TokenBucket(args.rps) if args.rps > 0 else None
+    limiter = AdaptiveLimiter(initial_limit=args.concurrency, max_limit=args.max_concurrency, rate_limiter=rate_limiter)
+    calendar = TradingCalendar()
+
+    fetch_metrics = FetchMetrics(limiter)
+    metrics_path = args.metrics
+    sampler = None
+    if args.metrics_interval > 0:
+        sampler = asyncio.create_task(fetch_metrics.sample_periodically(args.metrics_interval, metrics_path))
+
+    try:
+        async with aiohttp.ClientSession(trace_configs=trace_configs) as session:
+            await fetch_with_mode(args, session, all_funds, today, week_dates, limiter, calendar, emit, on_partial)
+    finally:
+        if sampler is not None:
+            sampler.cancel()
+        if liveness is not None:
+            liveness.save()
+
+    print(f"Fetch finished with {limiter.summary()}", flush=True)
+    print(f"Requests: {fetch_metrics.summary()}", flush=True)
+    if hedging is not None:
+        print(f"Hedging: {hedging.summary()}", flush=True)
+    if metrics_path is not None:
+        fetch_metrics.dump(metrics_path)
+        print(f"Request metrics written to {metrics_path}", flush=True)
+    if response_cache is not None:
+        print(response_cache.summary(), flush=True)
+    if liveness is not None:
+        print(liveness.summary(), flush=True)
+    return results
+
+# Run the selected fetch mode, passing every (fund, full name, prices) row to emit.
+# Requests are served by priority class (see fetch_schedule); in range and daily mode the rows of the
+# high-priority work are also passed to on_partial, in one call, as soon as all of them are done.
+async def fetch_with_mode(args, session, all_funds, today, week_dates, limiter, calendar, emit, on_partial=None):
+    number_of_weeks = len(week_dates)
+    schedule = FetchSchedule(number_of_weeks)
+    if args.mode == 'update':
+        # Rows are built (and journaled) only after every delta is stored, since they need the trading days of
+        # the whole store; an interrupted update resumes from the store, which commits each fund as it lands
+        history_start = calendar.earliest_acceptable_day(week_dates[-1], LOOKBACK_DAYS)
+        store = PriceStore(args.store)
+        try:
+            await update_price_store(session, store, all_funds, history_start, today, limiter, schedule)
+            for result in process_store_results(store, all_funds, history_start, today, week_dates, calendar):
+                emit(result)
+        finally:
+            store.close()
+    elif args.mode == 'bulk':
+        price_matrix, fund_names = await fetch_all_funds_for_dates(session, [today] + week_dates, limiter, calendar, schedule)
+        print(f"Bulk response covers {len(price_matrix)} funds over {len(price_matrix.columns)} trading days", flush=True)
+        for result in process_bulk_results(price_matrix, fund_names, all_funds, today, week_dates, calendar):
+            emit(result)
+    else:
+        partial = None
+        if args.mode == 'range':
+            if on_partial is not None:
+                partial = PartialResults(sum(schedule.is_portfolio(fund) for fund in all_funds), on_partial)
+            total_funds = len(all_funds)
+            tasks = [process_fund_range(session, fund, today, week_dates, number_of_weeks, limiter, total_funds, calendar,
+                                        schedule) for fund in all_funds]
+        else:
+            if on_partial is not None:
+                partial = PartialResults(len(all_funds), on_partial)
+            total_prices = len(all_funds) * number_of_weeks
+            tasks = [process_fund(session, fund, today, week_dates, number_of_weeks, limiter, total_prices, calendar,
+                                  schedule, partial) for fund in all_funds]
+
+        for future in asyncio.as_completed(tasks):
+            result = await future
+            if args.mode == 'range' and partial is not None and schedule.is_portfolio(result[0]):
+                partial.add(result)
+            emit(result)
+
+# Fetch every fund and write the profit and price outputs.
+# With keep_tables=True both outputs are also returned as DataFrames keyed by their CSV paths.
+async def main(args, keep_tables=False):
     today = datetime.now() - timedelta(days=1)
     if today.weekday() > 4:
         today = get_previous_friday(today)
@@ -128,45 +505,93 @@ async def main():
             all_funds = [line.strip() for line in file]
     except FileNotFoundError:
         print(f"Error: The file 'fund_names.txt' was not found in {script_dir}.", flush=True)
-        return
+        return None
+
+    journal_path = args.journal
+    liveness_path = args.liveness
+    if args.shard is not None:
+        if args.mode == 'bulk':
+            print("Error: --shard cannot be used with --mode bulk, which fetches every fund in the same requests.", flush=True)
+            return None
+        shard_index, shard_count = args.shard
+        all_funds = shard_funds(all_funds, shard_index, shard_count)
+        print(f"Shard {shard_index}/{shard_count}: {len(all_funds)} funds", flush=True)
+        # Local shard processes must not share one journal
+        if journal_path == DEFAULT_JOURNAL_PATH:
+            journal_path = journal_path.with_name(f'{journal_path.stem}.{shard_tag(shard_index, shard_count)}{journal_path.suffix}')
+        if liveness_path == DEFAULT_LIVENESS_PATH:
+            liveness_path = liveness_path.with_name(f'{liveness_path.stem}.{shard_tag(shard_index, shard_count)}{liveness_path.suffix}')
 
     number_of_weeks = 74
     week_dates = [today - timedelta(weeks=week) for week in range(1, number_of_weeks + 1)]
     week_dates_str = [date.strftime('%Y-%m-%d') for date in week_dates]
 
-    # Generate timestamp for filenames
-    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-
-    profit_csv_path = script_dir / f'all_fund_profit_percentages_api_{timestamp}.csv'
-    price_csv_path = script_dir / f'all_fund_prices_api_{timestamp}.csv'
-
     today_str = today.strftime('%Y-%m-%d')
 
-    semaphore = asyncio.Semaphore(15)
+    # Finished funds are journaled; a resumed run reuses the interrupted run's timestamp and rows
+    run = {
+        'mode': args.mode,
+        'today': today_str,
+        'weeks': number_of_weeks,
+        'funds': zlib.crc32('\n'.join(all_funds).encode('utf-8')),
+        'shard': list(args.shard) if args.shard is not None else None,
+        'timestamp': datetime.now().strftime('%Y-%m-%d_%H-%M-%S'),
+    }
+    journal = FetchJournal(journal_path, run, resume=args.resume)
+    timestamp = journal.timestamp
+    remaining_funds = [fund for fund in all_funds if fund not in journal.completed]
+    if args.resume:
+        print(f"Resuming run {timestamp}: {len(all_funds) - len(remaining_funds)} funds already done, "
+              f"{len(remaining_funds)} left", flush=True)
 
-    total_prices = len(all_funds) * number_of_weeks
+    if args.shard is not None:
+        profit_csv_path = shard_output_path(script_dir, 'all_fund_profit_percentages_api', *args.shard)
+        price_csv_path = shard_output_path(script_dir, 'all_fund_prices_api', *args.shard)
+        profit_csv_path.parent.mkdir(exist_ok=True)
+    else:
+        profit_csv_path = script_dir / f'all_fund_profit_percentages_api_{timestamp}.csv'
+        price_csv_path = script_dir / f'all_fund_prices_api_{timestamp}.csv'
 
-    async with aiohttp.ClientSession() as session:
-        tasks = [process_fund(session, fund, today, week_dates, number_of_weeks, semaphore, total_prices) for fund in all_funds]
+    # Rows are appended as funds complete, then both files are re-sorted by fund code
+    writer = StreamingResultWriter(profit_csv_path, price_csv_path, today_str, week_dates_str,
+                                   columnar=not args.no_columnar, keep_tables=keep_tables)
 
-        results = []
-        for future in asyncio.as_completed(tasks):
-            result = await future
-            results.append(result)
+    def add_result(result):
+        writer.add(result)
+        journal.add(result)
 
-    # Write to files
-    with open(profit_csv_path, 'w', encoding='utf-8') as profit_file, open(price_csv_path, 'w', encoding='utf-8') as price_file:
-        price_header = 'Fund,Full Fund Name,Start Date (' + today_str + '),' + ','.join([f'{i} Weeks ({date})' for i, date in enumerate(week_dates_str, start=1)]) + '\n'
-        price_file.write(price_header)
+    # The high-priority rows (plus any resumed ones) are written to partial/ as soon as they are all done
+    partial_tag = f'.{shard_tag(*args.shard)}' if args.shard is not None else ''
+    partial_profit_path = script_dir / PARTIAL_DIR_NAME / f'all_fund_profit_percentages_api{partial_tag}.csv'
+    partial_price_path = script_dir / PARTIAL_DIR_NAME / f'all_fund_prices_api{partial_tag}.csv'
 
-        profit_header = 'Fund,Full Fund Name,' + ','.join([f'{i} Weeks' for i in range(1, number_of_weeks + 1)]) + '\n'
-        profit_file.write(profit_header)
+    def publish_partial(rows):
+        partial_profit_path.parent.mkdir(exist_ok=True)
+        partial_writer = StreamingResultWriter(partial_profit_path, partial_price_path, today_str, week_dates_str,
+                                               columnar=False)
+        for fund in all_funds:
+            if fund in journal.completed:
+                partial_writer.add(journal.completed[fund])
+        for row in rows:
+            partial_writer.add(row)
+        partial_writer.close()
+        elapsed_str = time.strftime("%H:%M:%S", time.gmtime(time.time() - start_time))
+        print(f"Partial results for {len(rows)} high-priority funds written to {partial_profit_path} "
+              f"and {partial_price_path.name} - {elapsed_str} elapsed", flush=True)
 
-        for fund, full_fund_name, today_price, weekly_profits, weekly_prices in results:
-            profit_file.write(f"{fund},{full_fund_name},{','.join(weekly_profits)}\n")
-            price_file.write(f"{fund},{full_fund_name},{today_price if today_price else 'None'},{','.join(weekly_prices)}\n")
+    try:
+        for fund in all_funds:
+            if fund in journal.completed:
+                writer.add(journal.completed[fund])
+        if remaining_funds:
+            await fetch_results(args, remaining_funds, today, week_dates, on_result=add_result,
+                                liveness_path=liveness_path, on_partial=None if args.no_partial else publish_partial)
+    finally:
+        journal.close()
+        writer.close()
 
     print(f"All profit percentages and prices have been written to their respective CSV files.", flush=True)
+    return writer.tables() if keep_tables else None
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,217 @@
+import argparse
+import warnings
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import BACKTEST, CONFIGS
+from fund_index import FundNameIndex
+from price_history import LOOKBACK_DAYS
+from price_store import DEFAULT_STORE_PATH, PriceStore
+from rank_engine import filter_mask, filtered_ranks
+from time_analysis import remove_timestamped_outputs
+
+
+def load_price_matrix(store_path: Path) -> Tuple[List[str], List[str], np.ndarray, np.ndarray]:
+    """Load (funds, full names, trading days, funds x days prices) from the price store.
+
+    A missing price is filled from the fund's previous price up to LOOKBACK_DAYS
+    trading days back, the same tolerance the live fetch allows.
+    """
+    store = PriceStore(store_path)
+    try:
+        matrix = store.price_matrix()
+        full_names = store.full_names()
+    finally:
+        store.close()
+    matrix = matrix.ffill(axis=1, limit=LOOKBACK_DAYS - 1)
+    funds = matrix.index.astype(str).tolist()
+    days = np.array(matrix.columns, dtype='datetime64[D]')
+    return funds, [full_names.get(fund, '') for fund in funds], days, matrix.to_numpy(dtype=np.float64)
+
+
+def rebalance_columns(days: np.ndarray, every: int) -> np.ndarray:
+    """Every `every`-th trading day counting back from the last one, oldest first."""
+    return np.arange(len(days) - 1, -1, -every)[::-1]
+
+
+def lag_columns(days: np.ndarray, columns: np.ndarray, weeks: int) -> np.ndarray:
+    """Column of the last trading day on or before `weeks` weeks before each rebalance (-1 if none)."""
+    targets = days[columns] - np.timedelta64(7 * weeks, 'D')
+    return np.searchsorted(days, targets, side='right') - 1
+
+
+def period_returns(prices: np.ndarray, end_columns: np.ndarray, start_columns: np.ndarray) -> np.ndarray:
+    """Funds x periods returns in percent; NaN where a price is missing, zero or before the history."""
+    start = prices[:, np.maximum(start_columns, 0)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = (prices[:, end_columns] - start) / start * 100
+    returns[:, start_columns < 0] = np.nan
+    returns[start == 0] = np.nan
+    return returns
+
+
+def trailing_returns(prices: np.ndarray, days: np.ndarray, columns: np.ndarray,
+                     weeks: List[int]) -> Dict[int, np.ndarray]:
+    """Trailing N-week return of every fund at every rebalance, one funds x rebalances matrix per horizon."""
+    return {week: period_returns(prices, columns, lag_columns(days, columns, week)) for week in weeks}
+
+
+def selection_matrix(trailing: Dict[int, np.ndarray], weeks: List[int], top_n: int, min_appearances: int,
+                     eligible: np.ndarray) -> np.ndarray:
+    """Boolean funds x rebalances matrix of the funds a config picks at every rebalance at once.
+
+    Same rule as find_overlapping_funds: top N among eligible funds per horizon,
+    kept when a fund makes at least min_appearances of the horizons.
+    """
+    appearances = sum((filtered_ranks(trailing[week], eligible) < top_n).astype(np.int64) for week in weeks)
+    return appearances >= min_appearances
+
+
+def backtest_config(name: str, config: dict, trailing: Dict[int, np.ndarray], forward: np.ndarray,
+                    eligible: np.ndarray, rebalance_days: np.ndarray) -> pd.DataFrame:
+    """Per-rebalance results of one config: selection size, forward returns, hit rate and turnover.
+
+    Rebalances where any of the config's horizons reaches back before the stored
+    history, or with no forward period left, are skipped.
+    """
+    weeks = config['weeks']
+    selected = selection_matrix(trailing, weeks, config['top_n'], config['min_appearances'], eligible)
+    warm = np.all([~np.isnan(trailing[week]).all(axis=0) for week in weeks], axis=0)
+    periods = np.flatnonzero(warm[:-1])
+    if not len(periods):
+        return pd.DataFrame()
+
+    selected = selected[:, periods]
+    forward = forward[:, periods]
+    universe = np.where(eligible[:, None], forward, np.nan)
+    picked = np.where(selected, forward, np.nan)
+    with warnings.catch_warnings():
+        # Periods where nothing was picked give an all-NaN column; their mean is NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        portfolio = np.nanmean(picked, axis=0)
+        benchmark = np.nanmean(universe, axis=0)
+        median = np.nanmedian(universe, axis=0)
+    scored = selected & ~np.isnan(forward)
+    hits = (scored & (forward > median)).sum(axis=0)
+    scored_count = scored.sum(axis=0)
+
+    # Share of each period's selection that was not held in the previous period
+    count = selected.sum(axis=0)
+    new = np.concatenate([[0], (selected[:, 1:] & ~selected[:, :-1]).sum(axis=0)])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hit_rate = np.where(scored_count > 0, hits / scored_count, np.nan)
+        turnover = np.where(count > 0, new / count, np.nan)
+    turnover[0] = np.nan
+
+    return pd.DataFrame({
+        'config': name,
+        'date': rebalance_days[periods].astype(str),
+        'next_date': rebalance_days[periods + 1].astype(str),
+        'selected': count,
+        'portfolio_return': portfolio,
+        'benchmark_return': benchmark,
+        'excess_return': portfolio - benchmark,
+        'hit_rate': hit_rate,
+        'turnover': turnover,
+    })
+
+
+def summarize(periods: pd.DataFrame) -> pd.DataFrame:
+    """One row per config: average and compounded returns, hit rate and turnover over all periods."""
+    def compounded(returns: pd.Series) -> float:
+        return float((1 + returns.fillna(0) / 100).prod() - 1) * 100
+
+    rows = []
+    for name, group in periods.groupby('config', sort=False):
+        rows.append({
+            'config': name,
+            'periods': len(group),
+            'first_date': group['date'].iloc[0],
+            'last_date': group['next_date'].iloc[-1],
+            'mean_selected': group['selected'].mean(),
+            'mean_return': group['portfolio_return'].mean(),
+            'mean_benchmark': group['benchmark_return'].mean(),
+            'total_return': compounded(group['portfolio_return']),
+            'total_benchmark': compounded(group['benchmark_return']),
+            'hit_rate': group['hit_rate'].mean(),
+            'mean_turnover': group['turnover'].mean(),
+        })
+    return pd.DataFrame(rows)
+
+
+def run_backtest(funds: List[str], full_names: List[str], days: np.ndarray, prices: np.ndarray,
+                 configs: dict, rebalance_every: int) -> pd.DataFrame:
+    """Replay every config at every rebalance date and return the per-period results."""
+    columns = rebalance_columns(days, rebalance_every)
+    all_weeks = sorted({week for config in configs.values() for week in config['weeks']})
+    trailing = trailing_returns(prices, days, columns, all_weeks)
+    # Return from each rebalance to the next; the last rebalance has none
+    forward = np.full((len(funds), len(columns)), np.nan)
+    forward[:, :-1] = period_returns(prices, columns[1:], columns[:-1])
+
+    fund_codes = pd.Series(funds)
+    name_index = FundNameIndex(full_names)
+    results = []
+    for name, config in configs.items():
+        eligible = filter_mask(fund_codes, name_index, config['exclude_words'], config['particular_funds'])
+        result = backtest_config(name, config, trailing, forward, eligible, days[columns])
+        if result.empty:
+            print(f"  {name}: not enough history for {max(config['weeks'])} weeks, skipped")
+            continue
+        results.append(result)
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Backtest the CONFIGS selection rules over the stored daily prices.')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH,
+                        help='SQLite price store filled by async.py --mode update')
+    parser.add_argument('--rebalance-every', type=int, default=BACKTEST['rebalance_every'],
+                        help='trading days between rebalances (default: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def main(args=None):
+    if args is None:
+        args = parse_args()
+    script_dir = Path(__file__).parent
+
+    if not Path(args.store).exists():
+        print(f"Error: price store {args.store} not found. Run async.py --mode update first.")
+        return
+
+    funds, full_names, days, prices = load_price_matrix(args.store)
+    if not len(funds):
+        print("Error: price store is empty.")
+        return
+    print(f"Loaded {len(funds)} funds x {len(days)} trading days ({days[0]} to {days[-1]})")
+
+    started = datetime.now()
+    periods = run_backtest(funds, full_names, days, prices, CONFIGS, args.rebalance_every)
+    print(f"Backtest finished in {(datetime.now() - started).total_seconds():.2f}s")
+    if periods.empty:
+        print("No config had enough history to backtest.")
+        return
+
+    summary = summarize(periods)
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    # Keep only the latest backtest outputs: excel_writer turns every CSV here into a sheet
+    remove_timestamped_outputs(script_dir, [BACKTEST['periods_file'], BACKTEST['summary_file']])
+    for key, table in (('periods_file', periods), ('summary_file', summary)):
+        output_path = Path(BACKTEST[key])
+        output_path = script_dir / f"{output_path.stem}_{timestamp}{output_path.suffix}"
+        table.to_csv(output_path, index=False, encoding='utf-8')
+        print(f"Saved {len(table)} rows to {output_path.name}")
+
+    print()
+    for _, row in summary.iterrows():
+        print(f"  {row['config']}: {row['periods']} periods, mean return {row['mean_return']:.3f}% "
+              f"vs {row['mean_benchmark']:.3f}%, hit rate {row['hit_rate']:.1%}, turnover {row['mean_turnover']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
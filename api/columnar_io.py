@@ -0,0 +1,82 @@
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# pyarrow is optional: without it only the CSV outputs are written and read
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def columnar_available() -> bool:
+    return pa is not None
+
+
+def columnar_path(csv_path: Path) -> Path:
+    """Path of the typed Parquet file written alongside a CSV output."""
+    return Path(csv_path).with_suffix('.parquet')
+
+
+class ParquetResultWriter:
+    """Write fund rows to a typed Parquet file block by block.
+
+    Values are float64 with real NaNs; fund codes are stored dictionary-encoded
+    so pandas loads them as a categorical column.
+    """
+
+    def __init__(self, path: Path, value_columns: List[str]):
+        self.path = Path(path)
+        self.value_columns = value_columns
+        self.schema = pa.schema(
+            [('Fund', pa.string()), ('Full Fund Name', pa.string())] +
+            [(column, pa.float64()) for column in value_columns]
+        )
+        self.writer = pq.ParquetWriter(str(self.path), self.schema)
+
+    def write_block(self, funds: List[str], full_fund_names: List[str], values: np.ndarray):
+        arrays = [pa.array(funds, pa.string()), pa.array(full_fund_names, pa.string())]
+        arrays += [pa.array(values[:, index], pa.float64()) for index in range(values.shape[1])]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self, sort: bool = True):
+        """Close the file; optionally rewrite it sorted by fund code with a categorical fund column."""
+        self.writer.close()
+        if not sort:
+            return
+        table = pq.read_table(str(self.path)).sort_by('Fund')
+        table = table.set_column(0, 'Fund', table.column('Fund').dictionary_encode())
+        tmp_path = self.path.with_name(f'{self.path.name}.sorting')
+        pq.write_table(table, str(tmp_path))
+        tmp_path.replace(self.path)
+
+
+def merge_parquet(paths: List[Path], target: Path):
+    """Concatenate Parquet outputs with the same columns into one file sorted by fund code.
+
+    The result has the same layout as a closed ParquetResultWriter file.
+    """
+    tables = []
+    for path in paths:
+        table = pq.read_table(str(path))
+        tables.append(table.set_column(0, 'Fund', table.column('Fund').cast(pa.string())))
+    table = pa.concat_tables(tables).sort_by('Fund')
+    table = table.set_column(0, 'Fund', table.column('Fund').dictionary_encode())
+    tmp_path = Path(target).with_name(f'{Path(target).name}.merging')
+    pq.write_table(table, str(tmp_path))
+    tmp_path.replace(target)
+
+
+def load_output_table(path: Path) -> Optional[pd.DataFrame]:
+    """Load a fetch output, preferring its typed Parquet sibling over the CSV when available."""
+    path = Path(path)
+    parquet_path = columnar_path(path)
+    if columnar_available() and parquet_path.exists():
+        return pd.read_parquet(parquet_path)
+    if path.suffix == '.parquet':
+        path = path.with_suffix('.csv')
+    return pd.read_csv(path)
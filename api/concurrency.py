@@ -0,0 +1,249 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+from typing import Optional
+
+import aiohttp
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter: a random delay in [0, min(cap, base * 2 ** attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def is_congestion_error(exc: Optional[BaseException]) -> bool:
+    """Whether an error signals that TEFAS is overloaded or throttling us."""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status == 429 or exc.status >= 500
+    return isinstance(exc, (asyncio.TimeoutError, aiohttp.ServerDisconnectedError, aiohttp.ClientConnectionError))
+
+
+class RetryBudget:
+    """Caps retries and hedged duplicates at `ratio` of first attempts, plus a small reserve."""
+
+    def __init__(self, ratio: float = 0.05, reserve: int = 10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.requests = 0
+        self.spent = 0
+
+    def deposit(self):
+        """Count one first attempt."""
+        self.requests += 1
+
+    def allowance(self) -> float:
+        return self.reserve + self.ratio * self.requests
+
+    def try_spend(self, share: float = 1.0) -> bool:
+        """Take one extra attempt if the budget spent stays within share of the allowance."""
+        if self.spent + 1 > share * self.allowance():
+            return False
+        self.spent += 1
+        return True
+
+
+class LatencyWindow:
+    """Quantiles of the latest `size` request latencies."""
+
+    def __init__(self, size: int = 500):
+        self.samples = deque(maxlen=size)
+        self._sorted = None
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self._sorted = None
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class HedgePolicy:
+    """Hedge delay and per-attempt timeout from live latencies, and the retry budget they share.
+
+    Until `warmup` responses have been seen there is no hedging and attempts
+    get max_timeout. After that a request still running after the
+    hedge_quantile latency is hedged, and an attempt times out after
+    timeout_factor times the p99 latency, kept within [min_timeout, max_timeout].
+    Hedges may use at most hedge_share of the budget, so retries of failed
+    requests always keep the rest.
+    """
+
+    def __init__(self, budget_ratio: float = 0.05, hedge_quantile: float = 0.95, timeout_factor: float = 4.0,
+                 min_timeout: float = 2.0, max_timeout: float = 20.0, warmup: int = 50, hedge_share: float = 0.5):
+        self.budget = RetryBudget(budget_ratio)
+        self.hedge_share = hedge_share
+        self.latencies = LatencyWindow()
+        self.hedge_quantile = hedge_quantile
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.warmup = warmup
+
+    def observe(self, seconds: float):
+        self.latencies.observe(seconds)
+
+    def try_hedge(self) -> bool:
+        return self.budget.try_spend(self.hedge_share)
+
+    def hedge_delay(self) -> Optional[float]:
+        if len(self.latencies) < self.warmup:
+            return None
+        return self.latencies.quantile(self.hedge_quantile)
+
+    def attempt_timeout(self) -> float:
+        if len(self.latencies) < self.warmup:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, self.timeout_factor * self.latencies.quantile(0.99)))
+
+    def summary(self) -> str:
+        delay = self.hedge_delay()
+        delay_text = '-' if delay is None else f'{delay * 1000:.0f}ms'
+        return (f"hedge delay {delay_text}, attempt timeout {self.attempt_timeout():.1f}s, "
+                f"retry budget {self.budget.spent}/{self.budget.allowance():.0f} used")
+
+
+class TokenBucket:
+    """Global requests-per-second limit: `rate` tokens per second, bursting up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """AIMD (additive-increase, multiplicative-decrease) limit on in-flight requests.
+
+    Every healthy response (no error, latency within latency_tolerance times the
+    baseline latency) adds 1/limit to the limit, i.e. about +1 per round of
+    requests. A 429, 5xx, timeout or dropped connection multiplies the limit by
+    backoff_factor, at most once per round: failures of requests that started
+    before the last decrease are not counted again. The baseline is the
+    baseline_quantile latency of the latest successful responses, so a single
+    unusually fast reply (a tiny or empty range) does not raise the bar for
+    the rest of the run.
+
+    Waiting requests get free slots in priority order (lowest first), first
+    come first served within a priority.
+    """
+
+    def __init__(self, initial_limit: int = 15, min_limit: int = 2, max_limit: int = 64,
+                 backoff_factor: float = 0.5, latency_tolerance: float = 3.0,
+                 rate_limiter: Optional[TokenBucket] = None, baseline_quantile: float = 0.1,
+                 baseline_window: int = 200):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self.rate_limiter = rate_limiter
+        self.in_flight = 0
+        self.latencies = LatencyWindow(baseline_window)
+        self.baseline_quantile = baseline_quantile
+        self.peak_limit = self.limit
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def slot(self, priority: int = 0):
+        """Context manager holding one in-flight request: `async with limiter.slot(priority): ...`"""
+        return _LimiterSlot(self, priority)
+
+    async def _acquire(self, priority: int = 0) -> float:
+        granted = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), granted))
+        self._grant()
+        try:
+            await granted
+        except asyncio.CancelledError:
+            # Cancelled right after being granted a slot: hand it on
+            if granted.done() and not granted.cancelled():
+                self._free_slot()
+            raise
+        if self.rate_limiter is not None:
+            try:
+                await self.rate_limiter.acquire()
+            except BaseException:
+                self._free_slot()
+                raise
+        return time.monotonic()
+
+    def _free_slot(self):
+        self.in_flight -= 1
+        self._grant()
+
+    def _grant(self):
+        """Hand free slots to the highest-priority waiters."""
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, granted = heapq.heappop(self._waiters)
+            if granted.done():
+                continue
+            self.in_flight += 1
+            granted.set_result(None)
+
+    async def _release(self, started: float, exc: Optional[BaseException]):
+        latency = time.monotonic() - started
+        if is_congestion_error(exc):
+            self._on_congestion(started)
+        elif exc is None:
+            self._on_success(latency)
+        self._free_slot()
+
+    def _on_success(self, latency: float):
+        self.latencies.observe(latency)
+        if latency <= self.baseline_latency() * self.latency_tolerance:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.peak_limit = max(self.peak_limit, self.limit)
+
+    def _on_congestion(self, started: float):
+        if started < self._last_decrease:
+            return
+        self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+        self._last_decrease = time.monotonic()
+        self.decreases += 1
+
+    def baseline_latency(self) -> Optional[float]:
+        return self.latencies.quantile(self.baseline_quantile)
+
+    def summary(self) -> str:
+        return (f"concurrency limit {self.limit:.1f} (peak {self.peak_limit:.1f}), "
+                f"{self.decreases} backoffs")
+
+
+class _LimiterSlot:
+    def __init__(self, limiter: AdaptiveLimiter, priority: int = 0):
+        self.limiter = limiter
+        self.priority = priority
+        self.started = None
+
+    async def __aenter__(self):
+        self.started = await self.limiter._acquire(self.priority)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.limiter._release(self.started, exc)
+        return False
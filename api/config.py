@@ -41,3 +41,40 @@ CONFIGS = {
         'output_file': 'my_portfolio_analysis.csv'
     },
 }
+
+# Parameter grid for the overlap strategy sweep (python time_analysis.py --sweep)
+# Week sets come from 'weeks' plus every combination of 'weeks_set_sizes' horizons drawn from 'weeks_pool'
+SWEEP_GRID = {
+    'weeks': [config['weeks'] for config in CONFIGS.values()],
+    'weeks_pool': [2, 4, 8, 12, 15, 24, 26, 36, 37, 52, 72],
+    'weeks_set_sizes': [4, 5, 6],
+    'top_n': [20, 25, 30, 35, 40, 45, 50],
+    'min_appearances': [2, 3, 4, 5, 6],
+    'exclude_words': {
+        'all_special': COMMON_EXCLUSIONS['all_special'],
+        'none': [],
+    },
+    'output_file': 'sweep_summary.csv'
+}
+
+# Historical backtest of CONFIGS over the price store (python backtest.py)
+BACKTEST = {
+    'rebalance_every': 5,  # trading days between rebalances
+    'summary_file': 'backtest_summary.csv',
+    'periods_file': 'backtest_periods.csv'
+}
+
+# Rolling-window screen (python configurable_weeks_sort.py)
+# Each period is (window length in weeks, top N); windows end at the longest horizon column
+WEEKS_SORT = {
+    'periods': [(1, 35), (2, 35), (3, 35), (5, 35), (8, 30), (12, 30), (18, 28), (26, 28), (36, 28), (48, 25), (53, 25)],
+    # 'periods': [(1, 30), (2, 30), (4, 30), (6, 30), (8, 30), (10, 30), (12, 30), (14, 30), (16, 30), (18, 30), (20, 30), (22, 30), (24, 30)],
+    'exclude_keywords': ['TEKNOLOJİ', 'TECHNOLOGY', 'BLOCKCHAIN', 'METAVERSE', 'TECHNOLOGIES', 'TEKNOLOGY'],
+    # Weeks in a window that must have data for its average to count (NaN weeks are skipped)
+    'min_valid_weeks': 1,
+    # Extra period sets to compare; each is summarized in period_sets_file
+    'period_sets': [],
+    'input_file': 'all_fund_profit_percentages_api.csv',
+    'output_file': 'configurable_weeks_sort.csv',
+    'period_sets_file': 'configurable_weeks_sets.csv'
+}
@@ -1,51 +1,63 @@
 import pandas as pd
 import os
+from config import WEEKS_SORT
+from columnar_io import load_output_table
+from fund_index import FundNameIndex
+from time_analysis import find_latest_profit_file
+from window_engine import WindowEngine
+from pathlib import Path
 
 # Directory of the script
 script_dir = os.path.dirname(os.path.realpath(__file__))
 
-# Load the data
-# df_path = os.path.join(script_dir, 'all_fund_percentages-0-72.csv')
-df_path = os.path.join(script_dir, 'all_fund_profit_percentages_api.csv')
-df = pd.read_csv(df_path)
-
-
-
-# Configurable periods
-# periods = [(1, 30), (2, 30), (4, 30), (6, 30), (8, 30), (10, 30), (12, 30), (14, 30), (16, 30), (18, 30), (20, 30), (22, 30), (24, 30)]
-periods = [(1, 35), (2, 35), (3, 35), (5, 35), (8, 30), (12, 30),(18, 28),(26, 28),(36, 28),(48, 25),(53, 25)]
-# Function to get top funds for a given period
-def get_top_funds_for_period(df, weeks, top_n):
-    latest_week = df.columns[-1].split()[0]
-    relevant_weeks = [f"{int(latest_week) - i} Weeks" for i in range(weeks)]
-    avg_weekly_performance = df[relevant_weeks].mean(axis=1)
-    top_funds = avg_weekly_performance.nlargest(top_n).index
-    return set(df.loc[top_funds, 'Fund'])
-
-# Get the top funds for each period
-top_funds_sets = [get_top_funds_for_period(df, weeks, top_n) for weeks, top_n in periods]
-
-# Find the intersection of top funds across all specified periods
-intersection_funds = set.intersection(*top_funds_sets)
-
-# Filter the DataFrame to only include these top funds
-df = df[df['Fund'].isin(intersection_funds)]
-
-# Exclude funds based on keywords in 'Full Fund Name'
-exclude_keywords = ['TEKNOLOJİ', 'TECHNOLOGY', 'BLOCKCHAIN', 'METAVERSE', 'TECHNOLOGIES', 'TEKNOLOGY']
-excluded_funds = df[df['Full Fund Name'].apply(lambda x: any(keyword in str(x).upper() for keyword in exclude_keywords))]
-included_funds = df[~df['Fund'].isin(excluded_funds['Fund'])]
-
-# Creating a single DataFrame for both included and excluded funds
-combined_df = pd.concat([
-    pd.DataFrame({'Category': ['Non-filtered Funds'], 'Fund': [''], 'Full Fund Name': ['']}), 
-    included_funds,
-    pd.DataFrame({'Category': ['Filtered Funds'], 'Fund': [''], 'Full Fund Name': ['']}), 
-    excluded_funds
-], ignore_index=True)
-
-# Writing the combined funds data to a CSV file in the script's directory
-combined_output_path = os.path.join(script_dir, 'configurable_weeks_sort.csv')
-combined_df.to_csv(combined_output_path, index=False)
-
-print(f"Combined funds have been written to {combined_output_path}")
+# Periods are (window length in weeks, top N) pairs from config.py
+periods = WEEKS_SORT['periods']
+exclude_keywords = WEEKS_SORT['exclude_keywords']
+
+def load_weekly_profits():
+    """Load the configured profit table, falling back to the newest fetch output."""
+    df_path = Path(script_dir) / WEEKS_SORT['input_file']
+    if not df_path.exists():
+        df_path = find_latest_profit_file(Path(script_dir))
+        if df_path is None:
+            raise FileNotFoundError(f"No profit percentages file found in {script_dir}")
+    print(f"Using input file: {df_path.name}")
+    return load_output_table(df_path)
+
+def main():
+    # Load the data
+    df = load_weekly_profits()
+
+    # Window averages for every period come from one pass over the weekly profit matrix
+    engine = WindowEngine(df, min_valid=WEEKS_SORT['min_valid_weeks'])
+
+    # Keep the funds that are in the top funds of every specified period
+    df = df[engine.top_mask(periods)]
+
+    # Exclude funds based on keywords in 'Full Fund Name'
+    excluded_funds = df[FundNameIndex(df['Full Fund Name']).keyword_mask(exclude_keywords)]
+    included_funds = df[~df['Fund'].isin(excluded_funds['Fund'])]
+
+    # Creating a single DataFrame for both included and excluded funds
+    combined_df = pd.concat([
+        pd.DataFrame({'Category': ['Non-filtered Funds'], 'Fund': [''], 'Full Fund Name': ['']}),
+        included_funds,
+        pd.DataFrame({'Category': ['Filtered Funds'], 'Fund': [''], 'Full Fund Name': ['']}),
+        excluded_funds
+    ], ignore_index=True)
+
+    # Writing the combined funds data to a CSV file in the script's directory
+    combined_output_path = os.path.join(script_dir, WEEKS_SORT['output_file'])
+    combined_df.to_csv(combined_output_path, index=False)
+
+    print(f"Combined funds have been written to {combined_output_path}")
+
+    # Compare any extra period sets from config.py against the same window ranks
+    if WEEKS_SORT['period_sets']:
+        summary = engine.evaluate_period_sets(WEEKS_SORT['period_sets'])
+        sets_output_path = os.path.join(script_dir, WEEKS_SORT['period_sets_file'])
+        summary.to_csv(sets_output_path, index=False)
+        print(f"{len(summary)} period sets have been written to {sets_output_path}")
+
+if __name__ == '__main__':
+    main()
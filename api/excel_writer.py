@@ -1,10 +1,16 @@
 import pandas as pd
+import numpy as np
+import argparse
 import os
 import glob
+import json
 import re
+import xlsxwriter
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 from config import COMMON_EXCLUSIONS
+from columnar_io import load_output_table
 
 # Directory of the script
 script_dir = os.path.dirname(os.path.realpath(__file__))
@@ -12,6 +18,9 @@ script_dir = os.path.dirname(os.path.realpath(__file__))
 # Get my_funds from config
 MY_FUNDS = COMMON_EXCLUSIONS['my_funds']
 
+# Sources of the last workbook, used to skip rebuilding it when nothing changed
+MANIFEST_NAME = 'output_manifest.json'
+
 def cleanup_previous_output_files(script_dir):
     """Remove previous output files generated by this script only.
 
@@ -46,93 +55,262 @@ def cleanup_previous_output_files(script_dir):
     else:
         print("No previous output files to clean up\n")
 
-# Clean up previous output files from this script
-print("Cleaning up previous output files...")
-cleanup_previous_output_files(script_dir)
+# Red-yellow-green scale used for every numeric column
+COLOR_SCALE = {
+    'type': '3_color_scale',
+    'min_color': "#F8696B", # Red for lowest values
+    'mid_color': "#FEE282", # Yellow for mid-range values
+    'max_color': "#73C37C"  # Green for highest values
+}
+
+def is_profit_sheet(sheet_name):
+    return sheet_name == 'all_fund_profit_percentages_api' or sheet_name.startswith('all_fund_profit_percentages')
+
+def unique_sheet_name(csv_path, used_names) -> str:
+    """The file's stem cut to Excel's 31-character limit, with a numeric suffix if that name is taken.
 
-# Get all CSV files in the script's directory
-csv_files = glob.glob(os.path.join(script_dir, '*.csv'))
+    Timestamped outputs of the same kind share their first 31 characters.
+    """
+    stem = Path(csv_path).stem
+    sheet_name = stem[:31]
+    number = 2
+    while sheet_name.lower() in used_names:
+        suffix = f'_{number}'
+        sheet_name = stem[:31 - len(suffix)] + suffix
+        number += 1
+    used_names.add(sheet_name.lower())
+    return sheet_name
+
+def source_files(script_dir):
+    return [Path(csv_file).resolve() for csv_file in sorted(glob.glob(os.path.join(script_dir, '*.csv')))]
 
-# Generate timestamp for filename
-timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+def iter_tables(script_dir, tables: Optional[Dict[Path, pd.DataFrame]] = None) -> Iterator[Tuple[Path, pd.DataFrame]]:
+    """Yield every CSV output in script_dir as (path, DataFrame), loading one file at a time.
 
-# Create a Pandas Excel writer using XlsxWriter as the engine
-output_excel_path = os.path.join(script_dir, f'output_{timestamp}.xlsx')
-with pd.ExcelWriter(output_excel_path, engine='xlsxwriter') as writer:
-    all_funds_df = None  # Store the all_fund_profit_percentages_api dataframe
+    Tables already held in memory (e.g. handed over by pipeline.py) are used
+    as they are instead of being read back from their files.
+    """
+    tables = {Path(path).resolve(): df for path, df in (tables or {}).items()}
+    for csv_path in source_files(script_dir):
+        if csv_path in tables:
+            yield csv_path, tables.pop(csv_path)
+        else:
+            # Read the CSV file into a DataFrame, using its typed Parquet copy when one exists
+            yield csv_path, load_output_table(csv_path)
+    # In-memory tables whose files are not in script_dir
+    yield from tables.items()
+
+def collect_tables(script_dir, tables: Optional[Dict[Path, pd.DataFrame]] = None) -> Dict[Path, pd.DataFrame]:
+    """Return every CSV output in script_dir as a DataFrame keyed by its path."""
+    return dict(iter_tables(script_dir, tables))
+
+def sources_signature(script_dir) -> list:
+    """Name, size and modification time of every source file, including typed Parquet copies."""
+    signature = []
+    for csv_path in source_files(script_dir):
+        for path in (csv_path, csv_path.with_suffix('.parquet')):
+            if path.exists():
+                stat = path.stat()
+                signature.append([path.name, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+def unchanged_workbook(script_dir, signature) -> Optional[Path]:
+    """Return the previous workbook if it was built from exactly these sources and still exists.
+
+    The check covers the whole workbook rather than single sheets. An .xlsx is
+    one zip that xlsxwriter always writes from scratch, and there is no public
+    API to copy a sheet over from the previous file. With constant_memory each
+    sheet's rows go to a private temporary file, so reusing an unchanged sheet
+    would mean patching xlsxwriter internals.
+    """
+    manifest_path = Path(script_dir) / MANIFEST_NAME
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        return None
+    workbook_path = Path(script_dir) / manifest.get('workbook', '')
+    if manifest.get('sources') == signature and manifest.get('my_funds') == MY_FUNDS and workbook_path.is_file():
+        return workbook_path
+    return None
 
-    for csv_file in csv_files:
-        # Read the CSV file into a DataFrame
-        df = pd.read_csv(csv_file)
+def save_manifest(script_dir, signature, workbook_path):
+    manifest = {'workbook': Path(workbook_path).name, 'sources': signature, 'my_funds': MY_FUNDS}
+    (Path(script_dir) / MANIFEST_NAME).write_text(json.dumps(manifest, indent=1), encoding='utf-8')
 
-        # Get the base name of the CSV file and truncate it to 31 characters
-        sheet_name = os.path.splitext(os.path.basename(csv_file))[0]
-        sheet_name = sheet_name[:31]
+def write_workbook(tables: Dict[Path, pd.DataFrame], output_excel_path):
+    """Write one sheet per table, plus the my_funds_detailed sheet, with color scales on numeric columns."""
+    # Create a Pandas Excel writer using XlsxWriter as the engine
+    with pd.ExcelWriter(output_excel_path, engine='xlsxwriter') as writer:
+        all_funds_df = None  # Store the all_fund_profit_percentages_api dataframe
+        used_names = {'my_funds_detailed'}
 
-        # Store the original dataframe for all_fund_profit_percentages_api
-        if sheet_name == 'all_fund_profit_percentages_api' or sheet_name.startswith('all_fund_profit_percentages'):
-            all_funds_df = df.copy()
+        for csv_path, df in tables.items():
+            # Get the base name of the CSV file, truncated to 31 characters and unique in the workbook
+            sheet_name = unique_sheet_name(csv_path, used_names)
 
-        # Write the DataFrame to a specific sheet in the Excel file
-        df.to_excel(writer, sheet_name=sheet_name, index=False)
+            # Store the original dataframe for all_fund_profit_percentages_api
+            if is_profit_sheet(sheet_name):
+                all_funds_df = df
 
-        # Get workbook and worksheet for conditional formatting
-        workbook  = writer.book
-        worksheet = writer.sheets[sheet_name]
+            # Write the DataFrame to a specific sheet in the Excel file
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
 
-        # Apply conditional formatting to all_fund_profit_percentages_api
-        if sheet_name == 'all_fund_profit_percentages_api' or sheet_name.startswith('all_fund_profit_percentages'):
-            # Get number of columns
-            num_cols = len(df.columns)
+            # Get worksheet for conditional formatting
+            worksheet = writer.sheets[sheet_name]
+
+            # Apply conditional formatting to all_fund_profit_percentages_api
+            if is_profit_sheet(sheet_name):
+                # Get number of columns
+                num_cols = len(df.columns)
+                for col in range(2, num_cols):  # Skip Fund and Full Fund Name columns
+                    # Apply a conditional format to the cell range.
+                    worksheet.conditional_format(1, col, len(df), col, COLOR_SCALE)
+
+            # Apply conditional formatting to top_funds, current_funds, and my_portfolio sheets
+            elif sheet_name.startswith('top_funds_') or sheet_name.startswith('current_funds_') or sheet_name.startswith('my_portfolio'):
+                # Find numeric columns (exclude Fund, Full Fund Name, Appearances)
+                numeric_col_indices = []
+                for col_idx, col_name in enumerate(df.columns):
+                    if col_name not in ['Fund', 'Full Fund Name', 'Appearances'] and df[col_name].dtype in ['float64', 'int64']:
+                        numeric_col_indices.append(col_idx)
+
+                # Apply conditional formatting to numeric columns
+                for col_idx in numeric_col_indices:
+                    worksheet.conditional_format(1, col_idx, len(df), col_idx, COLOR_SCALE)
+
+        # Create a new sheet with specific funds from all_fund_profit_percentages_api
+        if all_funds_df is not None:
+            # Filter to only include MY_FUNDS
+            my_funds_df = all_funds_df[all_funds_df['Fund'].isin(MY_FUNDS)].copy()
+
+            # Write to a new sheet
+            sheet_name = 'my_funds_detailed'
+            my_funds_df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+            # Get worksheet for conditional formatting
+            worksheet = writer.sheets[sheet_name]
+
+            # Apply the same conditional formatting as all_fund_profit_percentages_api
+            num_cols = len(my_funds_df.columns)
             for col in range(2, num_cols):  # Skip Fund and Full Fund Name columns
-                # Apply a conditional format to the cell range.
-                worksheet.conditional_format(1, col, len(df), col, {
-                    'type': '3_color_scale',
-                    'min_color': "#F8696B", # Red for lowest values
-                    'mid_color': "#FEE282", # Yellow for mid-range values
-                    'max_color': "#73C37C"  # Green for highest values
-                })
-
-        # Apply conditional formatting to top_funds, current_funds, and my_portfolio sheets
-        elif sheet_name.startswith('top_funds_') or sheet_name.startswith('current_funds_') or sheet_name.startswith('my_portfolio'):
-            # Find numeric columns (exclude Fund, Full Fund Name, Appearances)
-            numeric_col_indices = []
-            for col_idx, col_name in enumerate(df.columns):
-                if col_name not in ['Fund', 'Full Fund Name', 'Appearances'] and df[col_name].dtype in ['float64', 'int64']:
-                    numeric_col_indices.append(col_idx)
-
-            # Apply conditional formatting to numeric columns
-            for col_idx in numeric_col_indices:
-                worksheet.conditional_format(1, col_idx, len(df), col_idx, {
-                    'type': '3_color_scale',
-                    'min_color': "#F8696B", # Red for lowest values
-                    'mid_color': "#FEE282", # Yellow for mid-range values
-                    'max_color': "#73C37C"  # Green for highest values
-                })
-
-    # Create a new sheet with specific funds from all_fund_profit_percentages_api
-    if all_funds_df is not None:
-        # Filter to only include MY_FUNDS
-        my_funds_df = all_funds_df[all_funds_df['Fund'].isin(MY_FUNDS)].copy()
-
-        # Write to a new sheet
-        sheet_name = 'my_funds_detailed'
-        my_funds_df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-        # Get workbook and worksheet for conditional formatting
-        workbook  = writer.book
-        worksheet = writer.sheets[sheet_name]
-
-        # Apply the same conditional formatting as all_fund_profit_percentages_api
-        num_cols = len(my_funds_df.columns)
-        for col in range(2, num_cols):  # Skip Fund and Full Fund Name columns
-            worksheet.conditional_format(1, col, len(my_funds_df), col, {
-                'type': '3_color_scale',
-                'min_color': "#F8696B", # Red for lowest values
-                'mid_color': "#FEE282", # Yellow for mid-range values
-                'max_color': "#73C37C"  # Green for highest values
-            })
-
-        print(f"Created 'my_funds_detailed' sheet with {len(my_funds_df)} funds from config.py")
-
-print(f"All CSV files have been written to {output_excel_path}.")
+                worksheet.conditional_format(1, col, len(my_funds_df), col, COLOR_SCALE)
+
+            print(f"Created 'my_funds_detailed' sheet with {len(my_funds_df)} funds from config.py")
+
+def numeric_columns(df: pd.DataFrame, sheet_name: str):
+    """Indices of the columns that get a color scale on this sheet."""
+    if is_profit_sheet(sheet_name) or sheet_name == 'my_funds_detailed':
+        return list(range(2, len(df.columns)))  # Skip Fund and Full Fund Name columns
+    if sheet_name.startswith('top_funds_') or sheet_name.startswith('current_funds_') or sheet_name.startswith('my_portfolio'):
+        return [col_idx for col_idx, col_name in enumerate(df.columns)
+                if col_name not in ['Fund', 'Full Fund Name', 'Appearances'] and df[col_name].dtype in ['float64', 'int64']]
+    return []
+
+def write_fast_sheet(workbook, sheet_name: str, df: pd.DataFrame):
+    """Stream one DataFrame into a constant_memory worksheet, row by row from NumPy arrays.
+
+    Cells are written the way DataFrame.to_excel writes them: missing values
+    are left empty and infinities become 'inf' / '-inf' text.
+    """
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, [str(col_name) for col_name in df.columns])
+
+    is_number = [pd.api.types.is_numeric_dtype(df[col_name]) and not pd.api.types.is_bool_dtype(df[col_name])
+                 for col_name in df.columns]
+    number_indices = [col_idx for col_idx, number in enumerate(is_number) if number]
+    other_indices = [col_idx for col_idx, number in enumerate(is_number) if not number]
+
+    numbers = np.column_stack([df.iloc[:, col_idx].to_numpy(dtype=np.float64) for col_idx in number_indices]) \
+        if number_indices else np.empty((len(df), 0))
+    finite = np.isfinite(numbers)
+    others = [df.iloc[:, col_idx].astype(object).where(df.iloc[:, col_idx].notna(), None).tolist()
+              for col_idx in other_indices]
+
+    for row_idx in range(len(df)):
+        excel_row = row_idx + 1
+        for col_idx, column in zip(other_indices, others):
+            value = column[row_idx]
+            if value is not None:
+                worksheet.write(excel_row, col_idx, value if isinstance(value, (int, float, bool)) else str(value))
+        row_finite = finite[row_idx]
+        for position, value in enumerate(numbers[row_idx].tolist()):
+            if row_finite[position]:
+                worksheet.write_number(excel_row, number_indices[position], value)
+            elif value == value:
+                worksheet.write_string(excel_row, number_indices[position], 'inf' if value > 0 else '-inf')
+
+    # Color scales stay one rule per column: a single rule over the whole range would put every horizon on one scale
+    for col_idx in numeric_columns(df, sheet_name):
+        worksheet.conditional_format(1, col_idx, len(df), col_idx, COLOR_SCALE)
+
+def write_workbook_fast(tables: Iterable[Tuple[Path, pd.DataFrame]], output_excel_path):
+    """Write the same sheets as write_workbook with bounded memory.
+
+    Tables are consumed one at a time and each sheet is streamed to disk as it
+    is written (xlsxwriter constant_memory); only the my_funds rows of the
+    profit table are kept for the final sheet.
+    """
+    workbook = xlsxwriter.Workbook(str(output_excel_path), {'constant_memory': True})
+    try:
+        my_funds_df = None
+        used_names = {'my_funds_detailed'}
+        for csv_path, df in tables:
+            sheet_name = unique_sheet_name(csv_path, used_names)
+            if is_profit_sheet(sheet_name):
+                my_funds_df = df[df['Fund'].isin(MY_FUNDS)]
+            write_fast_sheet(workbook, sheet_name, df)
+
+        # Create a new sheet with specific funds from all_fund_profit_percentages_api
+        if my_funds_df is not None:
+            write_fast_sheet(workbook, 'my_funds_detailed', my_funds_df)
+            print(f"Created 'my_funds_detailed' sheet with {len(my_funds_df)} funds from config.py")
+    finally:
+        workbook.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Write every CSV output to one Excel workbook.')
+    parser.add_argument('--pandas', action='store_true',
+                        help='build the workbook with DataFrame.to_excel instead of the streaming writer')
+    parser.add_argument('--force', action='store_true',
+                        help='rebuild the workbook even if none of its source files changed')
+    return parser.parse_args(argv)
+
+def main(tables: Optional[Dict[Path, pd.DataFrame]] = None, args=None):
+    """Write every CSV output (or its in-memory table) to one timestamped workbook and return its path.
+
+    When no source file changed since the last build, the existing workbook is kept.
+    """
+    if args is None:
+        args = parse_args([])
+
+    signature = sources_signature(script_dir)
+    if not args.force:
+        previous = unchanged_workbook(script_dir, signature)
+        if previous is not None:
+            print(f"No source file changed since {previous.name} was built; keeping it.")
+            return previous
+
+    # Clean up previous output files from this script
+    print("Cleaning up previous output files...")
+    cleanup_previous_output_files(script_dir)
+
+    # Generate timestamp for filename
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+
+    output_excel_path = os.path.join(script_dir, f'output_{timestamp}.xlsx')
+    try:
+        if args.pandas:
+            write_workbook(collect_tables(script_dir, tables), output_excel_path)
+        else:
+            write_workbook_fast(iter_tables(script_dir, tables), output_excel_path)
+    except BaseException:
+        # Do not leave a half-written workbook behind
+        Path(output_excel_path).unlink(missing_ok=True)
+        raise
+    save_manifest(script_dir, signature, output_excel_path)
+
+    print(f"All CSV files have been written to {output_excel_path}.")
+    return Path(output_excel_path)
+
+if __name__ == '__main__':
+    main(args=parse_args())
@@ -0,0 +1,97 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+# Default location of the checkpoint journal, next to the scripts
+DEFAULT_JOURNAL_PATH = Path(__file__).parent / '.fetch_journal.jsonl'
+
+# Rows are fsynced in groups of this many; a crash loses at most these
+SYNC_EVERY = 50
+
+
+class FetchJournal:
+    """Append-only JSONL checkpoint of the fund rows a fetch run has finished.
+
+    The first line describes the run (mode, base date, weeks, fund list and
+    output timestamp); every further line is one finished (fund, full name,
+    prices) row. Resuming a journal whose run matches the current one returns
+    those rows and the original output timestamp, so the resumed run rewrites
+    the same files with the same content an uninterrupted run would have.
+    Rows without any price are not recorded and are fetched again on resume.
+    """
+
+    def __init__(self, path: Path, run: dict, resume: bool = False):
+        self.path = Path(path)
+        self.run = dict(run)
+        self.completed: Dict[str, tuple] = {}
+        self.pending_sync = 0
+
+        header = self._load() if resume else None
+        if header is not None:
+            self.run = header
+            self.file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self.completed = {}
+            self.file = open(self.path, 'w', encoding='utf-8')
+            self.file.write(json.dumps({'run': self.run}) + '\n')
+            self._sync()
+
+    @staticmethod
+    def same_run(header: dict, run: dict) -> bool:
+        return all(header.get(key) == value for key, value in run.items() if key != 'timestamp')
+
+    def _load(self) -> Optional[dict]:
+        """Read a matching journal's rows; drop a torn last line left by a crash mid-write."""
+        if not self.path.exists():
+            return None
+        valid_bytes = 0
+        header = None
+        with open(self.path, 'rb') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                if header is None:
+                    header = entry.get('run')
+                    if header is None or not self.same_run(header, self.run):
+                        return None
+                else:
+                    self.completed[entry['fund']] = (entry['fund'], entry['name'],
+                                                     np.array(entry['prices'], dtype=np.float64))
+                valid_bytes += len(line)
+        if header is None:
+            return None
+        if valid_bytes < self.path.stat().st_size:
+            os.truncate(self.path, valid_bytes)
+        return header
+
+    @property
+    def timestamp(self) -> str:
+        return self.run['timestamp']
+
+    def add(self, result):
+        """Record one finished (fund, full name, prices) row."""
+        fund, full_fund_name, prices = result
+        if np.isnan(prices).all():
+            return
+        # repr() of a float round-trips exactly, so resumed rows are bit-identical
+        self.file.write(json.dumps({'fund': fund, 'name': full_fund_name,
+                                    'prices': [float(price) for price in prices]}) + '\n')
+        self.pending_sync += 1
+        if self.pending_sync >= SYNC_EVERY:
+            self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending_sync = 0
+
+    def close(self):
+        self._sync()
+        self.file.close()
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import math
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+# Upper bounds (seconds) of the latency and queue-wait histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, math.inf)
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus semantics (a value lands in the first bucket >= it)."""
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * len(self.bounds)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated q-quantile, interpolated linearly inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.bounds, self.counts):
+            if count and seen + count >= rank:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'max': round(self.max, 6),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': {('+Inf' if math.isinf(bound) else str(bound)): count
+                        for bound, count in zip(self.bounds, self.counts)},
+        }
+
+
+class FetchMetrics:
+    """Counters and histograms for every TEFAS request of a run.
+
+    request_latency covers the HTTP exchange only (TEFAS speed), queue_wait the
+    time spent waiting for a limiter slot (our own queueing); status codes
+    separate throttling (429) and server errors from slowness.
+    """
+
+    def __init__(self, limiter=None):
+        self.limiter = limiter
+        self.started = time.monotonic()
+        self.request_latency = Histogram()
+        self.queue_wait = Histogram()
+        self.status_codes: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.requests = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+        self.bytes_received = 0
+        self.backoff_seconds = 0.0
+
+    def observe_wait(self, seconds: float):
+        self.queue_wait.observe(seconds)
+
+    def observe_response(self, status: int, seconds: float, size: int):
+        self.requests += 1
+        self.status_codes[status] += 1
+        self.request_latency.observe(seconds)
+        self.bytes_received += size
+
+    def observe_error(self, exc: BaseException, seconds: Optional[float] = None):
+        """Count a request that raised before a response arrived (timeouts, dropped connections)."""
+        if isinstance(exc, asyncio.TimeoutError):
+            self.timeouts += 1
+        self.errors[type(exc).__name__] += 1
+        if seconds is not None:
+            self.requests += 1
+            self.request_latency.observe(seconds)
+
+    def observe_retry(self, delay: float):
+        self.retries += 1
+        self.backoff_seconds += delay
+
+    def snapshot(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        snapshot = {
+            'elapsed_seconds': round(elapsed, 3),
+            'requests': self.requests,
+            'requests_per_second': round(self.requests / elapsed, 3) if elapsed > 0 else None,
+            'cache_hits': self.cache_hits,
+            'status_codes': {str(status): count for status, count in sorted(self.status_codes.items())},
+            'errors': dict(self.errors),
+            'retries': self.retries,
+            'timeouts': self.timeouts,
+            'failures': self.failures,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'budget_denied': self.budget_denied,
+            'bytes_received': self.bytes_received,
+            'backoff_seconds': round(self.backoff_seconds, 3),
+            'request_latency_seconds': self.request_latency.to_dict(),
+            'queue_wait_seconds': self.queue_wait.to_dict(),
+        }
+        if self.limiter is not None:
+            snapshot['limiter'] = {'limit': round(self.limiter.limit, 2), 'in_flight': self.limiter.in_flight,
+                                   'peak_limit': round(self.limiter.peak_limit, 2), 'backoffs': self.limiter.decreases}
+        return snapshot
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = 'tefas') -> str:
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: Dict[str, float]):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for labels, value in samples.items():
+                lines.append(f'{prefix}_{name}{labels} {value}')
+
+        def histogram(name: str, help_text: str, values: Histogram):
+            samples = {}
+            cumulative = 0
+            for bound, count in zip(values.bounds, values.counts):
+                cumulative += count
+                samples['{le="%s"}' % ('+Inf' if math.isinf(bound) else bound)] = cumulative
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} histogram')
+            for labels, value in samples.items():
+                lines.append(f'{prefix}_{name}_bucket{labels} {value}')
+            lines.append(f'{prefix}_{name}_sum {values.sum}')
+            lines.append(f'{prefix}_{name}_count {values.count}')
+
+        histogram('request_duration_seconds', 'Duration of TEFAS HTTP requests.', self.request_latency)
+        histogram('queue_wait_seconds', 'Time spent waiting for a concurrency slot.', self.queue_wait)
+        metric('responses_total', 'counter', 'Responses by HTTP status.',
+               {'{status="%s"}' % status: count for status, count in sorted(self.status_codes.items())})
+        metric('request_errors_total', 'counter', 'Requests that raised before a response, by exception type.',
+               {'{error="%s"}' % error: count for error, count in sorted(self.errors.items())})
+        metric('cache_hits_total', 'counter', 'Requests answered from the response cache.', {'': self.cache_hits})
+        metric('retries_total', 'counter', 'Retried requests.', {'': self.retries})
+        metric('timeouts_total', 'counter', 'Requests that timed out.', {'': self.timeouts})
+        metric('failures_total', 'counter', 'Requests that failed after every retry.', {'': self.failures})
+        metric('hedges_total', 'counter', 'Duplicate requests sent for slow requests.', {'': self.hedges})
+        metric('hedge_wins_total', 'counter', 'Hedged duplicates that answered first.', {'': self.hedge_wins})
+        metric('budget_denied_total', 'counter', 'Retries and hedges not sent because the retry budget was used up.',
+               {'': self.budget_denied})
+        metric('received_bytes_total', 'counter', 'Response bytes received.', {'': self.bytes_received})
+        metric('backoff_seconds_total', 'counter', 'Time slept between retries.', {'': round(self.backoff_seconds, 6)})
+        if self.limiter is not None:
+            metric('concurrency_limit', 'gauge', 'Current adaptive concurrency limit.', {'': round(self.limiter.limit, 3)})
+            metric('in_flight_requests', 'gauge', 'Requests currently in flight.', {'': self.limiter.in_flight})
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path: Path):
+        """Write the metrics to path: Prometheus text for .prom/.txt files, JSON otherwise."""
+        path = Path(path)
+        text = self.to_prometheus() if path.suffix in ('.prom', '.txt') else self.to_json()
+        tmp_path = path.with_name(f'{path.name}.tmp')
+        tmp_path.write_text(text, encoding='utf-8')
+        tmp_path.replace(path)
+
+    def summary(self) -> str:
+        def seconds(value: Optional[float]) -> str:
+            return '-' if value is None else f'{value * 1000:.0f}ms'
+
+        latency, wait = self.request_latency, self.queue_wait
+        statuses = ' '.join(f'{status}:{count}' for status, count in sorted(self.status_codes.items())) or '-'
+        elapsed = time.monotonic() - self.started
+        rate = self.requests / elapsed if elapsed > 0 else 0.0
+        return (f"{self.requests} requests ({rate:.1f}/s), latency p50 {seconds(latency.quantile(0.5))} "
+                f"p95 {seconds(latency.quantile(0.95))}, queue wait p50 {seconds(wait.quantile(0.5))} "
+                f"p95 {seconds(wait.quantile(0.95))}, status {statuses}, {self.retries} retries, "
+                f"{self.timeouts} timeouts, {self.hedges} hedges ({self.hedge_wins} won), "
+                f"{self.bytes_received / 1e6:.1f} MB")
+
+    async def sample_periodically(self, interval: float, path: Optional[Path] = None):
+        """Print a summary line (and refresh the dump at path) every interval seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            print(f"[metrics] {self.summary()}", flush=True)
+            if path is not None:
+                self.dump(path)
@@ -1,8 +1,12 @@
 import requests
-import pandas as pd
 from datetime import datetime, timedelta
 from pathlib import Path
 import os
+from response_cache import ResponseCache
+from tefas_parser import PriceHistory, parse_response
+
+# On-disk response cache shared with async.py
+response_cache = ResponseCache()
 
 # Function to get the previous Friday's date
 def get_previous_friday(date):
@@ -23,22 +27,27 @@ def fetch_fund_data(fund_code, start_date, end_date):
         'fonturkod': '',
         'fonunvantip': ''
     }
+    cached = response_cache.get_columns(payload)
+    if cached is not None:
+        return PriceHistory.from_columns(*cached)
+
     try:
         response = requests.post(url, data=payload)
         response.raise_for_status()
-        data = response.json()
-        return pd.DataFrame(data['data'])
+        history = parse_response(response.content)
+        response_cache.put_columns(payload, *history.to_columns())
+        return history
     except requests.RequestException as e:
         print(f"API request failed: {e}")
-        return pd.DataFrame()
+        return PriceHistory.empty()
 
 # Function to get the price of a fund on a specific day
 def get_single_day_price(date, fund_code):
-    df = fetch_fund_data(fund_code, date, date)
-    if not df.empty:
-        price = df['FIYAT'].astype(float).iloc[0]
+    history = fetch_fund_data(fund_code, date, date)
+    if len(history):
+        price = float(history.prices[0])
         price = f"{price:.3f}"
-        full_fund_name = df['FONUNVAN'].iloc[0]
+        full_fund_name = history.names[0]
         return price, full_fund_name
     else:
         return None, None
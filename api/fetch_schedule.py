@@ -0,0 +1,80 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from config import CONFIGS
+
+# Early partial outputs live in their own directory so the globs that look for
+# complete outputs (time_analysis, excel_writer) never pick them up
+PARTIAL_DIR_NAME = 'partial'
+
+# Priority classes of the fetch; lower numbers get request slots first.
+# Hedged duplicates of slow requests (--hedge) go ahead of everything else.
+PRIORITY_HEDGE = -1
+PRIORITY_PORTFOLIO = 0
+PRIORITY_CONFIG_WEEKS = 1
+PRIORITY_REST = 2
+
+
+def portfolio_funds(configs: Dict[str, dict] = CONFIGS) -> Set[str]:
+    """Fund codes that any configuration analyzes in particular (the funds we hold)."""
+    return {fund.strip().upper() for config in configs.values() for fund in config['particular_funds'] or []}
+
+
+def config_weeks(configs: Dict[str, dict] = CONFIGS) -> Set[int]:
+    """Week horizons that any configuration ranks funds on."""
+    return {week for config in configs.values() for week in config['weeks']}
+
+
+class FetchSchedule:
+    """Priority class of every (fund, week) request of a fetch run.
+
+    Portfolio funds come first, then today's price and the weeks the
+    configurations use, then the rest of the weekly grid. Week 0 stands for
+    today's price.
+    """
+
+    def __init__(self, number_of_weeks: int, portfolio: Optional[Iterable[str]] = None,
+                 priority_weeks: Optional[Iterable[int]] = None):
+        self.number_of_weeks = number_of_weeks
+        self.portfolio = portfolio_funds() if portfolio is None else {fund.strip().upper() for fund in portfolio}
+        weeks = config_weeks() if priority_weeks is None else set(priority_weeks)
+        self.priority_weeks = [0] + sorted(week for week in weeks if 1 <= week <= number_of_weeks)
+        self.other_weeks = [week for week in range(1, number_of_weeks + 1) if week not in weeks]
+
+    def is_portfolio(self, fund: str) -> bool:
+        return fund.strip().upper() in self.portfolio
+
+    def fund_priority(self, fund: str) -> int:
+        """Priority of requests that cover a fund's whole history."""
+        return PRIORITY_PORTFOLIO if self.is_portfolio(fund) else PRIORITY_REST
+
+    def week_priority(self, fund: str, week: int) -> int:
+        """Priority of the request for one week of a fund (0 for today)."""
+        if self.is_portfolio(fund):
+            return PRIORITY_PORTFOLIO
+        return PRIORITY_CONFIG_WEEKS if week in self.priority_weeks else PRIORITY_REST
+
+    def date_priority(self, week: int) -> int:
+        """Priority of an all-funds request for one week (0 for today)."""
+        return PRIORITY_CONFIG_WEEKS if week in self.priority_weeks else PRIORITY_REST
+
+
+class PartialResults:
+    """Collect the rows of the high-priority work and publish them once all expected rows are in.
+
+    publish is called at most once, with the list of (fund, full name, prices) rows.
+    """
+
+    def __init__(self, expected: int, publish: Callable[[List[tuple]], None]):
+        self.expected = expected
+        self.publish = publish
+        self.rows = []
+        self.published = expected <= 0
+
+    def add(self, row: tuple):
+        if self.published:
+            return
+        self.rows.append(row)
+        if len(self.rows) >= self.expected:
+            self.published = True
+            self.publish(self.rows)
+            self.rows = []
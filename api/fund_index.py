@@ -0,0 +1,64 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Turkish upper-casing: i -> İ and ı -> I (str.upper() alone turns i into I)
+_TURKISH_UPPER = str.maketrans({'i': 'İ', 'ı': 'I'})
+
+
+def fold_name(text) -> str:
+    """Turkish-aware case folding for matching fund names against keywords.
+
+    Text is NFC-normalized and upper-cased with Turkish rules (so 'gümüş' and
+    'GÜMÜŞ' agree), then dotted and dotless I are merged so Turkish ('TEKNOLOJİ')
+    and English ('BLOCKCHAIN') keywords both match regardless of how the name
+    was typed.
+    """
+    text = unicodedata.normalize('NFC', str(text)).translate(_TURKISH_UPPER).upper()
+    return text.replace('İ', 'I')
+
+
+@lru_cache(maxsize=None)
+def compile_keywords(keywords: Tuple[str, ...]) -> Optional['re.Pattern']:
+    """One compiled alternation matching any of the folded keywords (longest first)."""
+    folded = sorted({fold_name(keyword) for keyword in keywords if keyword}, key=len, reverse=True)
+    if not folded:
+        return None
+    return re.compile('|'.join(re.escape(keyword) for keyword in folded))
+
+
+def name_matches(fund_name: str, keywords: Iterable[str]) -> bool:
+    """Whether a single fund name contains any of the keywords."""
+    pattern = compile_keywords(tuple(keywords))
+    return pattern is not None and pattern.search(fold_name(fund_name)) is not None
+
+
+class FundNameIndex:
+    """Fund names folded once, with keyword masks memoized per keyword list.
+
+    Configs sharing an exclusion list (e.g. COMMON_EXCLUSIONS['all_special'])
+    get the same cached mask back.
+    """
+
+    def __init__(self, names: Iterable):
+        self.folded = pd.Series([fold_name(name) for name in names], dtype=object)
+        self._masks: Dict[Tuple[str, ...], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.folded)
+
+    def keyword_mask(self, keywords: Iterable[str]) -> np.ndarray:
+        """Boolean mask of names containing any of the keywords."""
+        key = tuple(keywords or [])
+        if key not in self._masks:
+            pattern = compile_keywords(key)
+            if pattern is None:
+                mask = np.zeros(len(self.folded), dtype=bool)
+            else:
+                mask = self.folded.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+            self._masks[key] = mask
+        return self._masks[key]
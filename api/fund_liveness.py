@@ -0,0 +1,218 @@
+import json
+import os
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from tefas_parser import PriceHistory
+from trading_calendar import as_date
+
+# Default location of the registry, next to the scripts
+DEFAULT_LIVENESS_PATH = Path(__file__).parent / '.fund_liveness.json'
+
+# A response whose first (last) price is more than this many days after its start (before its end)
+# shows a launch (delisting); longer than any market holiday stretch
+GAP_DAYS = 14
+
+# Delisted and never-listed funds are requested in full again after this many days
+RECHECK_DAYS = 7
+
+EPOCH = date(1970, 1, 1)
+
+# (first allowed day, last allowed day), None meaning unbounded
+Window = Tuple[Optional[date], Optional[date]]
+
+
+def history_spans(history: PriceHistory) -> Dict[str, Tuple[date, date]]:
+    """{fund code: (first date, last date)} of the rows in a response."""
+    spans = {}
+    for code, day in zip(history.codes, history.days.tolist()):
+        span = spans.get(code)
+        if span is None:
+            spans[code] = [day, day]
+        elif day < span[0]:
+            span[0] = day
+        elif day > span[1]:
+            span[1] = day
+    return {code.strip().upper(): (EPOCH + timedelta(days=first), EPOCH + timedelta(days=last))
+            for code, (first, last) in spans.items()}
+
+
+class FundLiveness:
+    """Persisted first and last observed trading dates of every fund.
+
+    Every successful response (or cache hit) is observed. A response that
+    starts well before a fund's first price marks the fund as launched on
+    that day; a long range without any price marks a fund that was never
+    listed. A response covering more than GAP_DAYS with no price in its
+    last GAP_DAYS shows a delisting, decided when the run is saved: only
+    then is it known that no other response has a later price. Single-day
+    requests never show a delisting, as they come back empty on missing days
+    and finish out of order.
+
+    Requests before a launch are skipped, requests after a delisting are
+    skipped until the next recheck, and never-listed funds are skipped
+    entirely until theirs. A recheck requests the full window again and
+    clears the delisting if prices reappear. Requests are gated by the
+    registry as loaded, never by what the current run has learned so far.
+    """
+
+    def __init__(self, path: Path, run_date, recheck_days: int = RECHECK_DAYS):
+        self.path = Path(path)
+        self.run_date = as_date(run_date)
+        self.recheck_days = recheck_days
+        self.funds: Dict[str, dict] = {}
+        self.skipped_funds = set()
+        self.shrunk_funds = set()
+        self.skipped_requests = 0
+        self.delisted_now = set()
+        self.relisted_now = set()
+        # (last price or None for an empty response, range start) of this run's responses with a long priceless tail
+        self.tails: Dict[str, list] = {}
+        self._load()
+        self.known = {code: dict(entry) for code, entry in self.funds.items()}
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                funds = json.load(file)['funds']
+        except (FileNotFoundError, ValueError, KeyError):
+            return
+        for code, entry in funds.items():
+            self.funds[code] = {key: date.fromisoformat(value) if value else None for key, value in entry.items()}
+
+    def save(self):
+        """Settle this run's delistings and write the registry atomically."""
+        self.settle()
+        funds = {code: {key: value.isoformat() if value else None for key, value in entry.items()}
+                 for code, entry in sorted(self.funds.items())}
+        tmp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'funds': funds}, file, indent=1)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def new_entry() -> dict:
+        return {'first': None, 'last': None, 'launched': None, 'delisted': None, 'checked': None}
+
+    def _due(self, entry: dict) -> bool:
+        return entry['checked'] is None or (self.run_date - entry['checked']).days >= self.recheck_days
+
+    def window(self, fund: str) -> Optional[Window]:
+        """Days worth requesting for fund, or None when the fund is skipped in this run."""
+        code = fund.strip().upper()
+        entry = self.known.get(code)
+        if entry is None:
+            return None, None
+        due = self._due(entry)
+        if entry['first'] is None:
+            if due:
+                return None, None
+            self.skipped_funds.add(code)
+            return None
+        low = entry['launched']
+        high = None if due else entry['delisted']
+        if low is not None or high is not None:
+            self.shrunk_funds.add(code)
+        return low, high
+
+    def clamp(self, fund: str, start_date, end_date) -> Optional[Tuple[date, date]]:
+        """Shrink [start_date, end_date] to the fund's window; None when nothing is left to request."""
+        window = self.window(fund)
+        if window is None:
+            return None
+        low, high = window
+        start, end = as_date(start_date), as_date(end_date)
+        if low is not None and low > start:
+            start = low
+        if high is not None and high < end:
+            end = high
+        if start > end:
+            self.skipped_funds.add(fund.strip().upper())
+            return None
+        return start, end
+
+    def allows(self, fund: str, day) -> bool:
+        """Whether a single-day request for fund can return a price; counts the requests it rules out."""
+        window = self.window(fund)
+        day = as_date(day)
+        if window is None or (window[0] is not None and day < window[0]) or (window[1] is not None and day > window[1]):
+            self.skipped_requests += 1
+            return False
+        return True
+
+    def observe(self, fund_code: str, start_date, end_date, history: PriceHistory):
+        """Learn from a successful response for fund_code ('' for every fund) over [start_date, end_date]."""
+        start, end = as_date(start_date), as_date(end_date)
+        if fund_code.strip():
+            span = None
+            if len(history):
+                span = (EPOCH + timedelta(days=int(history.days.min())), EPOCH + timedelta(days=int(history.days.max())))
+            self._observe(fund_code.strip().upper(), start, end, span)
+        else:
+            for code, span in history_spans(history).items():
+                self._observe(code, start, end, span)
+
+    def _observe(self, code: str, start: date, end: date, span: Optional[Tuple[date, date]]):
+        entry = self.funds.get(code)
+        long_range = (end - start).days > GAP_DAYS
+        if span is None:
+            if not long_range:
+                return
+            if entry is None:
+                entry = self.funds[code] = self.new_entry()
+            if entry['last'] is None:
+                entry['checked'] = self.run_date
+            self.tails.setdefault(code, []).append((None, start))
+            return
+
+        first, last = span
+        if entry is None:
+            entry = self.funds[code] = self.new_entry()
+        if entry['first'] is None or first < entry['first']:
+            entry['first'] = first
+        if entry['last'] is None or last > entry['last']:
+            entry['last'] = last
+
+        if entry['launched'] is not None and first < entry['launched']:
+            entry['launched'] = None
+        if (first - start).days > GAP_DAYS and first <= entry['first']:
+            entry['launched'] = first
+        if entry['delisted'] is not None and last > entry['delisted']:
+            entry['delisted'] = None
+            self.relisted_now.add(code)
+        if long_range and (end - last).days > GAP_DAYS:
+            self.tails.setdefault(code, []).append((last, start))
+
+    def settle(self):
+        """Mark the funds delisted whose latest price of the run is followed by a long priceless tail.
+
+        An empty response shows a delisting when it starts after the fund's last
+        price; one with prices when its own last price is the fund's last price.
+        """
+        for code, tails in self.tails.items():
+            entry = self.funds[code]
+            if entry['last'] is None:
+                continue
+            for tail_last, start in tails:
+                after_last = start > entry['last'] if tail_last is None else tail_last >= entry['last']
+                if not after_last:
+                    continue
+                if entry['delisted'] is None:
+                    entry['delisted'] = entry['last']
+                    self.delisted_now.add(code)
+                entry['checked'] = self.run_date
+                break
+        self.tails = {}
+
+    def summary(self) -> str:
+        listed = sum(1 for entry in self.funds.values() if entry['first'] is not None)
+        delisted = sum(1 for entry in self.funds.values() if entry['delisted'] is not None)
+        text = (f"fund liveness: {listed - delisted} live, {delisted} delisted, {len(self.funds) - listed} never listed; "
+                f"skipped {len(self.skipped_funds)} funds, shrank {len(self.shrunk_funds - self.skipped_funds)} windows, "
+                f"skipped {self.skipped_requests} single-day requests")
+        if self.delisted_now:
+            text += f"\n  newly delisted: {', '.join(sorted(self.delisted_now))}"
+        if self.relisted_now:
+            text += f"\n  listed again: {', '.join(sorted(self.relisted_now))}"
+        return text
@@ -0,0 +1,92 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from columnar_io import columnar_available, columnar_path, merge_parquet
+from price_store import DEFAULT_STORE_PATH, PriceStore
+from result_writer import sort_csv_by_fund
+from sharding import shard_output_paths
+
+# Outputs a single fetch run writes, as {base_name}_{timestamp}.csv
+OUTPUT_BASE_NAMES = ['all_fund_profit_percentages_api', 'all_fund_prices_api']
+
+
+def merge_csv(paths: List[Path], target: Path):
+    """Concatenate shard CSVs with identical headers and sort the rows by fund code."""
+    header = None
+    with open(target, 'w', encoding='utf-8') as merged:
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as shard:
+                shard_header = shard.readline()
+                if header is None:
+                    header = shard_header
+                    merged.write(header)
+                elif shard_header != header:
+                    raise ValueError(f"{path.name} has a different header (fetched on another day?)")
+                merged.writelines(shard)
+        merged.flush()
+        os.fsync(merged.fileno())
+    sort_csv_by_fund(target)
+
+
+def merge_outputs(script_dir: Path, count: int, timestamp: str, columnar: bool = True) -> List[Path]:
+    """Merge the outputs of shards 1..count into the files a single run would have written."""
+    merged_paths = []
+    for base_name in OUTPUT_BASE_NAMES:
+        paths = shard_output_paths(script_dir, base_name, count)
+        missing = [path.name for path in paths if not path.exists()]
+        if missing:
+            raise FileNotFoundError(f"missing shard outputs: {', '.join(missing)}")
+
+        target = script_dir / f'{base_name}_{timestamp}.csv'
+        merge_csv(paths, target)
+        merged_paths.append(target)
+
+        parquet_paths = [columnar_path(path) for path in paths]
+        if columnar and columnar_available() and all(path.exists() for path in parquet_paths):
+            merge_parquet(parquet_paths, columnar_path(target))
+            merged_paths.append(columnar_path(target))
+    return merged_paths
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Merge the outputs of async.py --shard i/N runs into one run\'s outputs.')
+    parser.add_argument('--shards', type=int, required=True, help='number of shards N')
+    parser.add_argument('--no-columnar', action='store_true', help='merge only the CSV outputs')
+    parser.add_argument('--stores', type=Path, nargs='*', default=[],
+                        help='price stores written by --mode update shards, folded into --store')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH, help='price store to merge --stores into')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    script_dir = Path(__file__).parent
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+
+    try:
+        merged_paths = merge_outputs(script_dir, args.shards, timestamp, columnar=not args.no_columnar)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}", flush=True)
+        return 1
+    for path in merged_paths:
+        print(f"Merged {args.shards} shards into {path.name}", flush=True)
+
+    if args.stores:
+        store = PriceStore(args.store)
+        try:
+            for other_path in args.stores:
+                if Path(other_path).resolve() == Path(args.store).resolve():
+                    continue
+                copied = store.merge_from(other_path)
+                print(f"Merged {copied} prices from {other_path} into {args.store}", flush=True)
+        finally:
+            store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import importlib
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import excel_writer
+import time_analysis
+
+# async.py cannot be imported with a plain import statement (its name is a keyword)
+fetcher = importlib.import_module('async')
+
+# Stages in the order they always run
+STAGES = ['fetch', 'analysis', 'excel']
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description='Run fetch, analysis and the Excel export in one process, handing tables over in memory.')
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help='comma-separated stages to run, from: %(default)s')
+    parser.add_argument('--input', type=Path, default=None,
+                        help='profit percentages CSV for the analysis when fetch is not run (default: the newest one)')
+    fetcher.add_fetch_arguments(parser)
+    args = parser.parse_args(argv)
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown or not stages:
+        parser.error(f"--stages must list some of {', '.join(STAGES)} (got: {args.stages})")
+    args.stages = [stage for stage in STAGES if stage in stages]
+    if args.shard is not None and args.stages != ['fetch']:
+        parser.error('--shard fetches part of the funds; run --stages fetch per shard, then merge_shards.py')
+    return args
+
+
+def profit_table(tables: Dict[Path, pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """The profit percentages table among the fetch outputs."""
+    for path, df in tables.items():
+        if Path(path).name.startswith('all_fund_profit_percentages'):
+            return df
+    return None
+
+
+def run_pipeline(args) -> Dict[str, float]:
+    """Run the selected stages and return the wall time of each in seconds.
+
+    Every table a stage produces is passed to the later stages directly; a
+    stage whose input was not produced in this run reads it from disk the same
+    way its standalone script does.
+    """
+    timings = {}
+    tables: Dict[Path, pd.DataFrame] = {}
+    profit_df = None
+
+    if 'fetch' in args.stages:
+        started = time.perf_counter()
+        fetched = asyncio.run(fetcher.main(args, keep_tables=True))
+        timings['fetch'] = time.perf_counter() - started
+        if fetched is None:
+            raise RuntimeError('fetch stage produced no output')
+        tables.update(fetched)
+        profit_df = profit_table(fetched)
+
+    if 'analysis' in args.stages:
+        started = time.perf_counter()
+        analysis_args = time_analysis.parse_args(['--input', str(args.input)] if args.input else [])
+        tables.update(time_analysis.main(analysis_args, df=profit_df))
+        timings['analysis'] = time.perf_counter() - started
+
+    if 'excel' in args.stages:
+        started = time.perf_counter()
+        excel_writer.main(tables)
+        timings['excel'] = time.perf_counter() - started
+
+    return timings
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    started = time.perf_counter()
+    try:
+        timings = run_pipeline(args)
+    except RuntimeError as e:
+        print(f"Error: {e}", flush=True)
+        return 1
+
+    print("\nStage timings:")
+    for stage, seconds in timings.items():
+        print(f"  {stage:<10} {seconds:8.2f}s")
+    print(f"  {'total':<10} {time.perf_counter() - started:8.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from tefas_parser import PriceHistory
+from trading_calendar import TradingCalendar, as_date
+
+# TEFAS rejects BindHistoryInfo requests spanning more than about three months
+MAX_RANGE_DAYS = 90
+
+# Number of trading days (including the base date) to look back for a price
+LOOKBACK_DAYS = 3
+
+# Calendar used when the caller has no observed trading days to share
+DEFAULT_CALENDAR = TradingCalendar()
+
+
+def split_date_range(start_date, end_date, max_days: int = MAX_RANGE_DAYS) -> List[Tuple[date, date]]:
+    """Split [start_date, end_date] into consecutive inclusive chunks of at most max_days days."""
+    start, end = as_date(start_date), as_date(end_date)
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=max_days - 1), end)
+        chunks.append((start, chunk_end))
+        start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def parse_tefas_date(value) -> date:
+    """Convert a TEFAS TARIH value (epoch milliseconds, as string or number) to a date."""
+    return pd.to_datetime(int(value), unit='ms').date()
+
+
+def history_to_series(history: PriceHistory) -> Tuple[Dict[date, float], str]:
+    """Turn a BindHistoryInfo response into a {date: price} mapping and the fund's full name."""
+    if history is None or not len(history):
+        return {}, ''
+    return history.to_series()
+
+
+def resolve_prices(series: Dict[date, float], dates: List, calendar: Optional[TradingCalendar] = None,
+                   lookback_days: int = LOOKBACK_DAYS) -> List[Optional[float]]:
+    """As-of lookup of the last price on or before each date.
+
+    A price only counts if it is no older than the lookback_days-th trading day
+    before the date, so holidays are skipped without accepting stale prices.
+    """
+    calendar = calendar or DEFAULT_CALENDAR
+    days = sorted(series)
+    prices = []
+    for day in dates:
+        index = calendar.asof(days, day, lookback_days)
+        prices.append(series[days[index]] if index is not None else None)
+    return prices
+
+
+def pivot_history(history: PriceHistory) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Pivot a multi-fund BindHistoryInfo response into a funds x dates price matrix.
+
+    Returns the matrix (index: fund code, columns: dates, NaN where no price was
+    published) and a {fund code: full fund name} mapping.
+    """
+    if history is None or not len(history):
+        return pd.DataFrame(), {}
+    return history.pivot()
+
+
+def matrix_row_to_series(matrix: pd.DataFrame, fund_code: str) -> Dict[date, float]:
+    """Extract one fund's {date: price} mapping from a pivoted price matrix."""
+    if fund_code not in matrix.index:
+        return {}
+    return matrix.loc[fund_code].dropna().to_dict()
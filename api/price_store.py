@@ -0,0 +1,98 @@
+import sqlite3
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from trading_calendar import as_date
+
+# Default location of the persistent price store, next to the scripts
+DEFAULT_STORE_PATH = Path(__file__).parent / 'fund_prices.sqlite'
+
+
+class PriceStore:
+    """SQLite-backed store of daily fund prices keyed by (fund, date).
+
+    Dates are stored as ISO strings so they sort and compare correctly in SQL.
+    """
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS prices (
+                fund TEXT NOT NULL,
+                date TEXT NOT NULL,
+                price REAL NOT NULL,
+                PRIMARY KEY (fund, date)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS funds (
+                fund TEXT PRIMARY KEY,
+                full_name TEXT NOT NULL
+            );
+        """)
+
+    def last_dates(self) -> Dict[str, date]:
+        """Return the last stored trading day for every fund in the store."""
+        rows = self.conn.execute('SELECT fund, MAX(date) FROM prices GROUP BY fund')
+        return {fund: date.fromisoformat(last) for fund, last in rows}
+
+    def save_history(self, fund: str, series: Dict[date, float], full_name: str = ''):
+        """Insert or replace a fund's prices and remember its full name."""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO prices (fund, date, price) VALUES (?, ?, ?)',
+                [(fund, as_date(day).isoformat(), price) for day, price in series.items()]
+            )
+            if full_name:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO funds (fund, full_name) VALUES (?, ?)',
+                    (fund, full_name)
+                )
+
+    def load_series(self, fund: str, start_date=None) -> Dict[date, float]:
+        """Load a fund's {date: price} mapping, optionally from start_date onwards."""
+        start = as_date(start_date).isoformat() if start_date is not None else ''
+        rows = self.conn.execute(
+            'SELECT date, price FROM prices WHERE fund = ? AND date >= ? ORDER BY date',
+            (fund, start)
+        )
+        return {date.fromisoformat(day): price for day, price in rows}
+
+    def trading_days(self) -> List[date]:
+        """Return every date on which at least one fund has a stored price, in order."""
+        rows = self.conn.execute('SELECT DISTINCT date FROM prices ORDER BY date')
+        return [date.fromisoformat(day) for day, in rows]
+
+    def price_matrix(self, start_date=None) -> pd.DataFrame:
+        """Load every stored price as a funds x trading days matrix (NaN where a fund has no price).
+
+        Rows are sorted by fund code and columns by date; the column index holds datetime.date values.
+        """
+        start = as_date(start_date).isoformat() if start_date is not None else ''
+        frame = pd.read_sql_query('SELECT fund, date, price FROM prices WHERE date >= ?', self.conn, params=(start,))
+        matrix = frame.pivot(index='fund', columns='date', values='price').sort_index().sort_index(axis=1)
+        matrix.columns = [date.fromisoformat(day) for day in matrix.columns]
+        return matrix
+
+    def merge_from(self, other_path: Path) -> int:
+        """Copy every price and fund name from another store into this one; return the prices copied."""
+        self.conn.execute('ATTACH DATABASE ? AS other', (str(other_path),))
+        try:
+            with self.conn:
+                copied = self.conn.execute('INSERT OR REPLACE INTO prices SELECT fund, date, price FROM other.prices').rowcount
+                self.conn.execute('INSERT OR REPLACE INTO funds SELECT fund, full_name FROM other.funds')
+        finally:
+            self.conn.execute('DETACH DATABASE other')
+        return copied
+
+    def full_names(self) -> Dict[str, str]:
+        return dict(self.conn.execute('SELECT fund, full_name FROM funds'))
+
+    def full_name(self, fund: str) -> Optional[str]:
+        row = self.conn.execute('SELECT full_name FROM funds WHERE fund = ?', (fund,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.conn.close()
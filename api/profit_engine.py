@@ -0,0 +1,39 @@
+from typing import List
+
+import numpy as np
+
+# Text written for missing values in the CSV outputs
+MISSING = 'None'
+
+
+def compute_profits(today_prices, start_prices) -> np.ndarray:
+    """Compute profit percentages for every fund and week in one broadcast operation.
+
+    today_prices has shape (funds,) and start_prices has shape (funds, weeks); a
+    single fund's 1-D row of start prices with a scalar today price works too.
+    Missing prices (NaN) and zero start prices yield NaN.
+    """
+    today = np.asarray(today_prices, dtype=np.float64)
+    start = np.asarray(start_prices, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profits = (np.expand_dims(today, -1) - start) / start * 100
+    profits[start == 0] = np.nan
+    return profits
+
+
+def format_matrix(values, precision: int = 3) -> np.ndarray:
+    """Format a float matrix as fixed-precision strings, with NaN written as MISSING."""
+    values = np.asarray(values, dtype=np.float64)
+    text = np.char.mod(f'%.{precision}f', values)
+    return np.where(np.isnan(values), MISSING, text)
+
+
+def round_matrix(values, precision: int = 3) -> np.ndarray:
+    """Round a float matrix to exactly the values its CSV text reads back as (NaN stays NaN)."""
+    return np.char.mod(f'%.{precision}f', np.asarray(values, dtype=np.float64)).astype(np.float64)
+
+
+def format_rows(leading_columns: List[List[str]], values) -> List[str]:
+    """Join leading text columns and a formatted float matrix into CSV lines."""
+    text = format_matrix(values)
+    return [','.join(list(leading) + row.tolist()) + '\n' for leading, row in zip(zip(*leading_columns), text)]
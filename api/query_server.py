@@ -0,0 +1,426 @@
+import argparse
+import asyncio
+import json
+import math
+import re
+import time
+from contextlib import suppress
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+from backtest import load_price_matrix, period_returns
+from columnar_io import columnar_path, load_output_table
+from config import COMMON_EXCLUSIONS, CONFIGS
+from price_store import DEFAULT_STORE_PATH
+from profit_engine import compute_profits
+from rank_engine import RankEngine
+from time_analysis import find_latest_profit_file, overlap_table
+
+DEFAULT_PORT = 8790
+
+# Seconds between checks for a new fetch output
+RELOAD_POLL_SECONDS = 10.0
+
+DEFAULT_TOP_N = 30
+
+# "Start Date (2026-10-16)" is week 0 of the price table, "12 Weeks (2026-07-24)" week 12
+PRICE_COLUMN = re.compile(r'^(?:Start Date|(\d+) Weeks) \((\d{4}-\d{2}-\d{2})\)$')
+
+
+class QueryError(ValueError):
+    """A malformed or unanswerable query, answered with 400."""
+
+
+def price_path_for(profit_path: Path) -> Path:
+    """The price table written by the same fetch run as a profit table."""
+    return profit_path.with_name(profit_path.name.replace('all_fund_profit_percentages_api', 'all_fund_prices_api'))
+
+
+def output_sources(script_dir: Path, store_path: Optional[Path]) -> Optional[tuple]:
+    """(path, mtime) of every file the newest snapshot is built from, or None before the first fetch.
+
+    The newest output is chosen by the timestamp in its name; modification
+    times only tell a rewritten file (the price store, a Parquet sibling) apart.
+    """
+    profit_path = find_latest_profit_file(script_dir)
+    if profit_path is None:
+        return None
+    price_path = price_path_for(profit_path)
+    paths = [profit_path, columnar_path(profit_path), price_path, columnar_path(price_path)]
+    if store_path is not None:
+        paths.append(Path(store_path))
+    return tuple((str(path), path.stat().st_mtime_ns) for path in paths if path.exists())
+
+
+def finite(value) -> Optional[float]:
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+class Snapshot:
+    """Everything the queries read, loaded once from one fetch output and the price store.
+
+    Holds the profit table with its RankEngine, the weekly prices of the
+    matching price table and, when the store exists, the daily price matrix,
+    all aligned on the profit table's fund order. A reload builds a new
+    snapshot and swaps it in whole; only the engine's rank caches change
+    after loading.
+    """
+
+    def __init__(self, profit_path: Path, store_path: Optional[Path] = None):
+        started = time.perf_counter()
+        self.profit_path = Path(profit_path)
+        self.profits = load_output_table(self.profit_path).reset_index(drop=True)
+        self.engine = RankEngine(self.profits)
+        self.funds = self.profits['Fund'].astype(str).str.strip().str.upper().tolist()
+        self.names = self.profits['Full Fund Name'].fillna('').astype(str).tolist()
+        self.fund_rows = {fund: row for row, fund in enumerate(self.funds)}
+        self.week_columns = {int(col.split()[0]): col for col in self.engine.columns}
+
+        self.weekly_dates, self.weekly_prices = self._load_weekly_prices(price_path_for(self.profit_path))
+        self.days, self.daily_prices = None, None
+        if store_path is not None and Path(store_path).exists():
+            self.days, self.daily_prices = self._load_daily_prices(Path(store_path))
+
+        # Warm the rank caches of the configured filters
+        for config in CONFIGS.values():
+            self.engine.ranks(config['exclude_words'], config['particular_funds'])
+        self.loaded_at = datetime.now()
+        self.load_seconds = time.perf_counter() - started
+
+    def _load_weekly_prices(self, price_path: Path) -> Tuple[Dict[int, str], Optional[np.ndarray]]:
+        """{week: date} and the funds x weeks price matrix (column = weeks back) of the price table."""
+        if not price_path.exists() and not columnar_path(price_path).exists():
+            return {}, None
+        table = load_output_table(price_path)
+        weeks = {}
+        for col in table.columns:
+            match = PRICE_COLUMN.match(str(col))
+            if match:
+                weeks[int(match.group(1) or 0)] = (col, match.group(2))
+        prices = np.full((len(self.funds), max(weeks, default=-1) + 1), np.nan)
+        rows = [self.fund_rows.get(fund) for fund in table['Fund'].astype(str).str.strip().str.upper()]
+        present = np.array([row is not None for row in rows], dtype=bool)
+        targets = np.array([row for row in rows if row is not None], dtype=np.int64)
+        for week, (col, _) in weeks.items():
+            values = pd.to_numeric(table[col], errors='coerce').to_numpy(dtype=np.float64)
+            prices[targets, week] = values[present]
+        return {week: day for week, (_, day) in sorted(weeks.items())}, prices
+
+    def _load_daily_prices(self, store_path: Path) -> Tuple[np.ndarray, np.ndarray]:
+        """Trading days and the funds x days price matrix of the store, on the profit table's rows."""
+        funds, _, days, prices = load_price_matrix(store_path)
+        aligned = np.full((len(self.funds), len(days)), np.nan)
+        for source, fund in enumerate(funds):
+            row = self.fund_rows.get(fund.strip().upper())
+            if row is not None:
+                aligned[row] = prices[source]
+        return days, aligned
+
+    def week_column(self, week: int) -> str:
+        if week not in self.week_columns:
+            raise QueryError(f"no '{week} Weeks' column (available: 1-{max(self.week_columns, default=0)})")
+        return self.week_columns[week]
+
+    def fund_row(self, fund: str) -> int:
+        row = self.fund_rows.get(fund.strip().upper())
+        if row is None:
+            raise QueryError(f"unknown fund: {fund}")
+        return row
+
+    def fund_entry(self, row: int) -> dict:
+        return {'fund': self.funds[row], 'name': self.names[row]}
+
+    def rank(self, week: int, top_n: int, exclude_words: List[str], particular_funds: Optional[List[str]]) -> dict:
+        """The top N funds of one week column."""
+        col_index = self.engine.column_index[self.week_column(week)]
+        ranks = self.engine.ranks(exclude_words, particular_funds)[:, col_index]
+        rows = np.flatnonzero(ranks < top_n)
+        rows = rows[np.argsort(ranks[rows], kind='stable')]
+        return {'weeks': week, 'funds': [{'rank': int(ranks[row]) + 1, **self.fund_entry(row),
+                                          'profit': finite(self.engine.values[row, col_index])} for row in rows]}
+
+    def overlap(self, weeks: List[int], top_n: int, min_appearances: int, exclude_words: List[str],
+                particular_funds: Optional[List[str]]) -> dict:
+        """Funds in the top N of at least min_appearances of the weeks, as time_analysis reports them."""
+        weeks = sorted(set(weeks))
+        week_columns = {week: self.week_column(week) for week in weeks}
+        result_df, _ = overlap_table(self.profits, self.engine, weeks, week_columns, top_n, min_appearances,
+                                     exclude_words, particular_funds)
+        funds = []
+        for row, appearances in zip(result_df.index, result_df.get('Appearances', [])):
+            profits = {str(week): finite(self.engine.values[row, self.engine.column_index[col]])
+                       for week, col in sorted(week_columns.items())}
+            funds.append({**self.fund_entry(row), 'appearances': int(appearances), 'profits': profits})
+        return {'weeks': sorted(weeks), 'top_n': top_n, 'min_appearances': min_appearances, 'funds': funds}
+
+    def weekly_returns(self, weeks: int, until: int) -> Tuple[np.ndarray, str, str]:
+        """Every fund's return from `weeks` weeks back to `until` weeks back, from the weekly price table."""
+        if self.weekly_prices is None:
+            raise QueryError(f"no price table next to {self.profit_path.name}")
+        if until >= weeks or weeks not in self.weekly_dates or until not in self.weekly_dates:
+            raise QueryError(f"need 0 <= until < weeks <= {max(self.weekly_dates)}")
+        returns = compute_profits(self.weekly_prices[:, until], self.weekly_prices[:, [weeks]])[:, 0]
+        return returns, self.weekly_dates[weeks], self.weekly_dates[until]
+
+    def daily_returns(self, days: int, end: Optional[date]) -> Tuple[np.ndarray, str, str]:
+        """Every fund's return over `days` calendar days ending on end (default: the last stored day)."""
+        if self.daily_prices is None:
+            raise QueryError("days= needs the price store; fill it with async.py --mode update")
+        end_target = np.datetime64(end, 'D') if end is not None else self.days[-1]
+        end_column = np.searchsorted(self.days, end_target, side='right') - 1
+        start_column = np.searchsorted(self.days, end_target - np.timedelta64(days, 'D'), side='right') - 1
+        if end_column < 0 or start_column < 0:
+            raise QueryError(f"the price store starts on {self.days[0]}")
+        returns = period_returns(self.daily_prices, np.array([end_column]), np.array([start_column]))[:, 0]
+        return returns, str(self.days[start_column]), str(self.days[end_column])
+
+    def returns(self, returns: np.ndarray, start: str, end: str, funds: List[str], top_n: int,
+                exclude_words: List[str], particular_funds: Optional[List[str]]) -> dict:
+        """Returns of the given funds, or the top N eligible funds by return when none are given."""
+        if funds:
+            rows = [self.fund_row(fund) for fund in funds]
+        else:
+            eligible = np.flatnonzero(self.engine.eligible_mask(exclude_words, particular_funds) & ~np.isnan(returns))
+            rows = eligible[np.argsort(-returns[eligible], kind='stable')][:top_n]
+        return {'from': start, 'to': end,
+                'funds': [{**self.fund_entry(row), 'return': finite(returns[row])} for row in rows]}
+
+    def status(self) -> dict:
+        return {
+            'source': self.profit_path.name,
+            'loaded_at': self.loaded_at.isoformat(timespec='seconds'),
+            'load_ms': round(self.load_seconds * 1000, 1),
+            'funds': len(self.funds),
+            'weeks': max(self.week_columns, default=0),
+            'weekly_prices': bool(self.weekly_dates),
+            'daily_prices': None if self.days is None else [str(self.days[0]), str(self.days[-1])],
+        }
+
+
+def int_param(query, name: str, default: Optional[int] = None, minimum: int = 0) -> Optional[int]:
+    value = query.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise QueryError(f"{name} must be an integer (got: {value})") from None
+    if number < minimum:
+        raise QueryError(f"{name} must be at least {minimum}")
+    return number
+
+
+def list_param(query, name: str) -> List[str]:
+    return [item.strip() for item in query.get(name, '').split(',') if item.strip()]
+
+
+def query_settings(query) -> dict:
+    """Ranking settings of a query: the named config's (config=0-36) with explicit parameters on top.
+
+    exclude and funds take a COMMON_EXCLUSIONS name (all_special, my_funds) or a comma-separated list.
+    """
+    name = query.get('config')
+    if name is not None and name not in CONFIGS:
+        raise QueryError(f"unknown config: {name} (available: {', '.join(CONFIGS)})")
+    config = CONFIGS.get(name, {})
+    settings = {
+        'weeks': list(config.get('weeks', [])),
+        'top_n': config.get('top_n', DEFAULT_TOP_N),
+        'min_appearances': config.get('min_appearances', 1),
+        'exclude_words': list(config.get('exclude_words') or []),
+        'particular_funds': config.get('particular_funds'),
+    }
+    if 'weeks' in query:
+        try:
+            settings['weeks'] = sorted({int(week) for week in list_param(query, 'weeks')})
+        except ValueError:
+            raise QueryError(f"weeks must be comma-separated integers (got: {query['weeks']})") from None
+    settings['top_n'] = int_param(query, 'top', settings['top_n'], minimum=1)
+    settings['min_appearances'] = int_param(query, 'min', settings['min_appearances'], minimum=1)
+    if 'exclude' in query:
+        words = query['exclude']
+        settings['exclude_words'] = list(COMMON_EXCLUSIONS[words]) if words in COMMON_EXCLUSIONS else list_param(query, 'exclude')
+    if 'funds' in query:
+        funds = query['funds']
+        settings['particular_funds'] = list(COMMON_EXCLUSIONS[funds]) if funds in COMMON_EXCLUSIONS else list_param(query, 'funds')
+    return settings
+
+
+class QueryServer:
+    """Answers ranking, overlap and return queries from the current snapshot and reloads it when a fetch lands.
+
+    A new output is loaded in a worker thread once its files have stayed
+    unchanged for one poll, then swapped in; queries keep reading the old
+    snapshot until then, so there is no downtime.
+    """
+
+    def __init__(self, script_dir: Path, store_path: Optional[Path], poll_seconds: float = RELOAD_POLL_SECONDS):
+        self.script_dir = script_dir
+        self.store_path = store_path
+        self.poll_seconds = poll_seconds
+        self.snapshot: Optional[Snapshot] = None
+        self.sources = None
+        self.reloads = 0
+        self._reload_lock = asyncio.Lock()
+
+    def load(self, sources: tuple) -> Snapshot:
+        store_path = self.store_path if self.store_path is not None and self.store_path.exists() else None
+        return Snapshot(Path(sources[0][0]), store_path)
+
+    def swap(self, snapshot: Snapshot, sources: tuple):
+        self.snapshot, self.sources = snapshot, sources
+        print(f"[query-server] serving {snapshot.profit_path.name}: {len(snapshot.funds)} funds, "
+              f"loaded in {snapshot.load_seconds:.2f}s", flush=True)
+
+    async def reload(self, sources: Optional[tuple] = None) -> bool:
+        """Load the newest output and swap it in; the current snapshot stays if loading fails."""
+        async with self._reload_lock:
+            if sources is None:
+                sources = await asyncio.to_thread(output_sources, self.script_dir, self.store_path)
+            if sources is None:
+                return False
+            try:
+                snapshot = await asyncio.to_thread(self.load, sources)
+            except Exception as exc:
+                print(f"[query-server] could not load {Path(sources[0][0]).name}: {exc}", flush=True)
+                return False
+            self.swap(snapshot, sources)
+            self.reloads += 1
+            return True
+
+    async def watch_outputs(self):
+        pending = None
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                sources = await asyncio.to_thread(output_sources, self.script_dir, self.store_path)
+            except OSError:
+                continue
+            if sources is None or sources == self.sources:
+                pending = None
+            elif sources != pending:
+                # Wait one more poll so a fetch still writing its outputs is not picked up half done
+                pending = sources
+            else:
+                await self.reload(sources)
+                pending = None
+
+    async def watcher(self, app: web.Application):
+        task = asyncio.create_task(self.watch_outputs())
+        yield
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+    def answer(self, request: web.Request, query) -> web.Response:
+        snapshot = self.snapshot
+        if snapshot is None:
+            return web.json_response({'error': f"no fetch output in {self.script_dir} yet"}, status=503)
+        started = time.perf_counter()
+        try:
+            body = query(snapshot, request.query)
+        except QueryError as exc:
+            return web.json_response({'error': str(exc)}, status=400)
+        body = {'source': snapshot.profit_path.name, 'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+                **body}
+        return web.json_response(body, dumps=lambda data: json.dumps(data, ensure_ascii=False))
+
+    async def handle_rank(self, request: web.Request) -> web.Response:
+        def query(snapshot: Snapshot, params) -> dict:
+            settings = query_settings(params)
+            if len(settings['weeks']) != 1:
+                raise QueryError("rank needs exactly one weeks= value")
+            return snapshot.rank(settings['weeks'][0], settings['top_n'], settings['exclude_words'],
+                                 settings['particular_funds'])
+        return self.answer(request, query)
+
+    async def handle_overlap(self, request: web.Request) -> web.Response:
+        def query(snapshot: Snapshot, params) -> dict:
+            settings = query_settings(params)
+            if not settings['weeks']:
+                raise QueryError("overlap needs weeks= or config=")
+            return snapshot.overlap(settings['weeks'], settings['top_n'], settings['min_appearances'],
+                                    settings['exclude_words'], settings['particular_funds'])
+        return self.answer(request, query)
+
+    async def handle_return(self, request: web.Request) -> web.Response:
+        def query(snapshot: Snapshot, params) -> dict:
+            settings = query_settings({key: value for key, value in params.items() if key != 'weeks'})
+            weeks, days = int_param(params, 'weeks', minimum=1), int_param(params, 'days', minimum=1)
+            if (weeks is None) == (days is None):
+                raise QueryError("return needs either weeks= (with until=) or days= (with end=)")
+            if weeks is not None:
+                returns, start, end = snapshot.weekly_returns(weeks, int_param(params, 'until', 0))
+            else:
+                try:
+                    end_day = date.fromisoformat(params['end']) if params.get('end') else None
+                except ValueError:
+                    raise QueryError(f"end must be YYYY-MM-DD (got: {params['end']})") from None
+                returns, start, end = snapshot.daily_returns(days, end_day)
+            return snapshot.returns(returns, start, end, list_param(params, 'fund'), settings['top_n'],
+                                    settings['exclude_words'], settings['particular_funds'])
+        return self.answer(request, query)
+
+    async def handle_status(self, request: web.Request) -> web.Response:
+        return self.answer(request, lambda snapshot, params: {**snapshot.status(), 'reloads': self.reloads,
+                                                               'configs': list(CONFIGS)})
+
+    async def handle_reload(self, request: web.Request) -> web.Response:
+        if not await self.reload():
+            return web.json_response({'error': 'nothing to load; see the server log'}, status=503)
+        return await self.handle_status(request)
+
+
+def build_app(server: QueryServer) -> web.Application:
+    app = web.Application()
+    app.router.add_get('/rank', server.handle_rank)
+    app.router.add_get('/overlap', server.handle_overlap)
+    app.router.add_get('/return', server.handle_return)
+    app.router.add_get('/status', server.handle_status)
+    app.router.add_post('/reload', server.handle_reload)
+    app.cleanup_ctx.append(server.watcher)
+    return app
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description='Serve ranking, overlap and return queries from the latest fetch output kept in memory.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', type=Path, default=None, help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--dir', type=Path, default=Path(__file__).parent,
+                        help='directory holding the fetch outputs (default: next to the scripts)')
+    parser.add_argument('--store', type=Path, default=DEFAULT_STORE_PATH,
+                        help='SQLite price store for days= returns, used when it exists')
+    parser.add_argument('--no-store', action='store_true', help='do not load the price store')
+    parser.add_argument('--poll', type=float, default=RELOAD_POLL_SECONDS,
+                        help='seconds between checks for a new fetch output')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    server = QueryServer(args.dir, None if args.no_store else args.store, args.poll)
+
+    sources = output_sources(args.dir, server.store_path)
+    if sources is None:
+        print(f"[query-server] no fetch output in {args.dir} yet; waiting for one", flush=True)
+    else:
+        server.swap(server.load(sources), sources)
+
+    if args.unix is not None:
+        print(f"[query-server] listening on {args.unix}", flush=True)
+        web.run_app(build_app(server), path=str(args.unix), print=None)
+    else:
+        print(f"[query-server] listening on http://{args.host}:{args.port}", flush=True)
+        web.run_app(build_app(server), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from fund_index import FundNameIndex
+
+# Rank given to missing or ineligible values so they never make a top N
+UNRANKED = np.iinfo(np.int64).max
+
+
+def descending_order(values: np.ndarray) -> np.ndarray:
+    """Row order of each column, largest first.
+
+    The stable sort keeps the original row order among ties, matching
+    nlargest(keep='first'); NaN sorts last.
+    """
+    return np.argsort(-values, axis=0, kind='stable')
+
+
+def filtered_ranks(values: np.ndarray, eligible: np.ndarray, order: Optional[np.ndarray] = None) -> np.ndarray:
+    """0-based rank of every row in every column among valid (non-NaN), eligible rows.
+
+    values is rows x columns; eligible is a boolean mask over rows. Other rows get UNRANKED.
+    """
+    if order is None:
+        order = descending_order(values)
+    keep = eligible[:, None] & ~np.isnan(values)
+    keep_sorted = np.take_along_axis(keep, order, axis=0)
+    rank_sorted = np.where(keep_sorted, np.cumsum(keep_sorted, axis=0) - 1, UNRANKED)
+    ranks = np.empty_like(rank_sorted)
+    np.put_along_axis(ranks, order, rank_sorted, axis=0)
+    return ranks
+
+
+def filter_mask(fund_codes: pd.Series, name_index: FundNameIndex, exclude_words: List[str],
+                particular_funds: Optional[List[str]]) -> np.ndarray:
+    """Boolean mask of funds allowed by a filter; particular funds take precedence over exclusions."""
+    if particular_funds is not None:
+        return fund_codes.astype(str).str.upper().isin([f.upper() for f in particular_funds]).to_numpy()
+    if exclude_words:
+        return ~name_index.keyword_mask(exclude_words)
+    return np.ones(len(fund_codes), dtype=bool)
+
+
+class RankEngine:
+    """Filtered per-week ranks of one profit table, shared by every configuration.
+
+    The descending order of each "N Weeks" column is computed once. For each
+    distinct filter (particular funds or exclusion words) every valid, eligible
+    fund gets its 0-based rank per column; ineligible or missing values rank
+    last. Top-N membership for any config is then just `ranks < top_n`.
+    """
+
+    WEEK_COLUMN = re.compile(r'^\d+ Weeks$')
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.columns = [col for col in df.columns if self.WEEK_COLUMN.match(str(col))]
+        self.column_index = {col: index for index, col in enumerate(self.columns)}
+        self.values = np.column_stack([pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+                                       for col in self.columns]) if self.columns else np.empty((len(df), 0))
+        self.valid = ~np.isnan(self.values)
+        self.order = descending_order(self.values)
+        self.name_index = FundNameIndex(df['Full Fund Name'])
+        self._masks: Dict[tuple, np.ndarray] = {}
+        self._ranks: Dict[tuple, np.ndarray] = {}
+
+    @staticmethod
+    def filter_key(exclude_words: List[str], particular_funds: Optional[List[str]]) -> tuple:
+        if particular_funds is not None:
+            return ('particular', tuple(sorted(f.upper() for f in particular_funds)))
+        return ('exclude', tuple(exclude_words or []))
+
+    def eligible_mask(self, exclude_words: List[str], particular_funds: Optional[List[str]]) -> np.ndarray:
+        """Boolean mask of funds allowed by the filter; particular funds take precedence over exclusions."""
+        key = self.filter_key(exclude_words, particular_funds)
+        if key not in self._masks:
+            self._masks[key] = filter_mask(self.df['Fund'], self.name_index, exclude_words, particular_funds)
+        return self._masks[key]
+
+    def ranks(self, exclude_words: List[str], particular_funds: Optional[List[str]]) -> np.ndarray:
+        """Rank of every fund in every week column among valid, eligible funds."""
+        key = self.filter_key(exclude_words, particular_funds)
+        if key not in self._ranks:
+            eligible = self.eligible_mask(exclude_words, particular_funds)
+            self._ranks[key] = filtered_ranks(self.values, eligible, self.order)
+        return self._ranks[key]
+
+    def top_membership(self, columns: List[str], top_n: int, exclude_words: List[str],
+                       particular_funds: Optional[List[str]]) -> np.ndarray:
+        """Boolean funds x columns matrix: whether each fund is in the top N of each column."""
+        indices = [self.column_index[col] for col in columns]
+        return self.ranks(exclude_words, particular_funds)[:, indices] < top_n
@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from tefas_parser import PRICE_FIELDS, loads
+
+# Default cache location, next to the scripts
+DEFAULT_CACHE_DIR = Path(__file__).parent / '.tefas_cache'
+
+# Only the fields the pipeline reads are kept, to keep a full-universe cache small
+CACHED_FIELDS = PRICE_FIELDS
+
+# Ranges ending at least this many days ago are settled and cached permanently
+SETTLED_DAYS = 2
+
+# Lifetime of ranges that include recent days, and of empty responses
+RECENT_TTL = 6 * 60 * 60
+EMPTY_TTL = 60 * 60
+
+
+class ResponseCache:
+    """On-disk cache of BindHistoryInfo responses keyed by the full request payload.
+
+    Entries are stored as gzip-compressed columnar JSON. Settled historical
+    ranges never expire, ranges touching recent days expire after recent_ttl
+    seconds and empty responses after empty_ttl seconds.
+    """
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, recent_ttl: int = RECENT_TTL, empty_ttl: int = EMPTY_TTL):
+        self.cache_dir = Path(cache_dir)
+        self.recent_ttl = recent_ttl
+        self.empty_ttl = empty_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(payload: Dict[str, str]) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f'{key}.json.gz'
+
+    def _ttl(self, payload: Dict[str, str], rows: list) -> Optional[int]:
+        if not rows:
+            return self.empty_ttl
+        end_date = datetime.strptime(payload['bittarih'], '%d.%m.%Y')
+        if end_date.date() <= (datetime.now() - timedelta(days=SETTLED_DAYS)).date():
+            return None
+        return self.recent_ttl
+
+    def get_columns(self, payload: Dict[str, str]) -> Optional[Tuple[List[str], List[list]]]:
+        """Return the cached (columns, rows) for payload, or None if missing or expired."""
+        path = self._path(self.key(payload))
+        try:
+            with gzip.open(path, 'rb') as file:
+                entry = loads(file.read())
+        except (FileNotFoundError, OSError, ValueError):
+            self.misses += 1
+            return None
+
+        if entry['ttl'] is not None and time.time() - entry['stored'] > entry['ttl']:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry['columns'], entry['rows']
+
+    def get(self, payload: Dict[str, str]) -> Optional[List[dict]]:
+        """Return the cached response rows for payload, or None if missing or expired."""
+        cached = self.get_columns(payload)
+        if cached is None:
+            return None
+        columns, rows = cached
+        return [dict(zip(columns, row)) for row in rows]
+
+    def put_columns(self, payload: Dict[str, str], columns: List[str], rows: List[list]):
+        """Store response rows given as value lists in the order of columns, written atomically."""
+        entry = {
+            'stored': time.time(),
+            'ttl': self._ttl(payload, rows),
+            'columns': list(columns),
+            'rows': rows,
+        }
+        path = self._path(self.key(payload))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+            json.dump(entry, file, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def put(self, payload: Dict[str, str], rows: List[dict]):
+        """Store response rows for payload, written atomically."""
+        columns = [field for field in CACHED_FIELDS if rows and field in rows[0]]
+        self.put_columns(payload, columns, [[row.get(field) for field in columns] for row in rows])
+
+    def summary(self) -> str:
+        return f"response cache: {self.hits} hits, {self.misses} misses"
@@ -0,0 +1,164 @@
+import heapq
+import os
+import tempfile
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from columnar_io import ParquetResultWriter, columnar_available, columnar_path
+from profit_engine import compute_profits, format_rows, round_matrix
+
+
+def fund_code_of(line: str) -> str:
+    return line.split(',', 1)[0]
+
+
+def sort_csv_by_fund(path: Path, chunk_rows: int = 50000):
+    """Stable external sort of a CSV's data rows by fund code, replacing the file atomically.
+
+    At most chunk_rows lines are held in memory: sorted runs are spilled to
+    temporary files and merged, keeping the original order of equal fund codes.
+    """
+    path = Path(path)
+    run_paths = []
+    with open(path, 'r', encoding='utf-8') as source:
+        header = source.readline()
+        while True:
+            chunk = list(islice(source, chunk_rows))
+            if not chunk:
+                break
+            chunk.sort(key=fund_code_of)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=path.parent, suffix='.run', delete=False) as run:
+                run.writelines(chunk)
+                run_paths.append(run.name)
+
+    run_files = [open(run_path, 'r', encoding='utf-8') for run_path in run_paths]
+    try:
+        tmp_path = path.with_name(f'{path.name}.sorting')
+        with open(tmp_path, 'w', encoding='utf-8') as target:
+            target.write(header)
+            target.writelines(heapq.merge(*run_files, key=fund_code_of))
+            target.flush()
+            os.fsync(target.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        for run_file in run_files:
+            run_file.close()
+        for run_path in run_paths:
+            os.unlink(run_path)
+
+
+class StreamingResultWriter:
+    """Append fund rows to the profit and price CSVs as funds complete.
+
+    Rows are buffered up to buffer_rows at a time; each flush computes the
+    block's profits in one vectorized step, appends both files and fsyncs them,
+    so a run that dies midway still leaves valid CSVs with every finished fund.
+    close() re-sorts both files by fund code without loading them whole.
+
+    With columnar=True (and pyarrow installed) typed Parquet copies of both
+    outputs are written next to the CSVs, one row group per flush, holding
+    the same 3-decimal values as the CSV text. With
+    keep_tables=True every flushed block is also kept in memory so tables()
+    can hand both outputs to the next stage without re-reading them.
+    """
+
+    def __init__(self, profit_csv_path: Path, price_csv_path: Path, today_str: str, week_dates_str: List[str],
+                 buffer_rows: int = 100, columnar: bool = True, keep_tables: bool = False):
+        self.profit_csv_path = Path(profit_csv_path)
+        self.price_csv_path = Path(price_csv_path)
+        self.number_of_weeks = len(week_dates_str)
+        self.buffer_rows = buffer_rows
+        self.buffer = []
+        self.rows_written = 0
+        self.kept_blocks = [] if keep_tables else None
+
+        self.profit_file = open(self.profit_csv_path, 'w', encoding='utf-8')
+        self.price_file = open(self.price_csv_path, 'w', encoding='utf-8')
+
+        self.price_columns = price_columns = [f'Start Date ({today_str})'] + [f'{i} Weeks ({date})' for i, date in enumerate(week_dates_str, start=1)]
+        self.price_file.write('Fund,Full Fund Name,' + ','.join(price_columns) + '\n')
+
+        self.profit_columns = profit_columns = [f'{i} Weeks' for i in range(1, self.number_of_weeks + 1)]
+        self.profit_file.write('Fund,Full Fund Name,' + ','.join(profit_columns) + '\n')
+        self._sync()
+
+        self.profit_parquet = None
+        self.price_parquet = None
+        if columnar and columnar_available():
+            self.profit_parquet = ParquetResultWriter(columnar_path(self.profit_csv_path), profit_columns)
+            self.price_parquet = ParquetResultWriter(columnar_path(self.price_csv_path), price_columns)
+
+    def add(self, result):
+        """Queue one (fund, full fund name, prices) row, flushing when the buffer is full."""
+        self.buffer.append(result)
+        if len(self.buffer) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        funds = [fund for fund, _, _ in self.buffer]
+        full_fund_names = [full_fund_name for _, full_fund_name, _ in self.buffer]
+        price_matrix = np.vstack([prices for _, _, prices in self.buffer])
+        profit_matrix = compute_profits(price_matrix[:, 0], price_matrix[:, 1:])
+
+        self.profit_file.writelines(format_rows([funds, full_fund_names], profit_matrix))
+        self.price_file.writelines(format_rows([funds, full_fund_names], price_matrix))
+        self._sync()
+        if self.profit_parquet is not None or self.kept_blocks is not None:
+            # Same 3-decimal values as the CSVs, so every copy of the outputs ranks funds the same way
+            profit_matrix, price_matrix = round_matrix(profit_matrix), round_matrix(price_matrix)
+        if self.profit_parquet is not None:
+            self.profit_parquet.write_block(funds, full_fund_names, profit_matrix)
+            self.price_parquet.write_block(funds, full_fund_names, price_matrix)
+        if self.kept_blocks is not None:
+            self.kept_blocks.append((funds, full_fund_names, profit_matrix, price_matrix))
+        self.rows_written += len(self.buffer)
+        self.buffer = []
+
+    def _sync(self):
+        for file in (self.profit_file, self.price_file):
+            file.flush()
+            os.fsync(file.fileno())
+
+    def close(self, sort: bool = True):
+        """Flush remaining rows, close both files and optionally re-sort them by fund code."""
+        self.flush()
+        self.profit_file.close()
+        self.price_file.close()
+        if sort:
+            sort_csv_by_fund(self.profit_csv_path)
+            sort_csv_by_fund(self.price_csv_path)
+        if self.profit_parquet is not None:
+            self.profit_parquet.close(sort)
+            self.price_parquet.close(sort)
+
+    def tables(self) -> Dict[Path, pd.DataFrame]:
+        """The profit and price outputs kept in memory, keyed by their CSV paths and sorted like the files.
+
+        Values are rounded to the 3 decimals of the CSV text.
+
+        Only available when the writer was created with keep_tables=True.
+        """
+        if self.kept_blocks is None:
+            raise ValueError('StreamingResultWriter was created without keep_tables=True')
+        funds = [fund for block in self.kept_blocks for fund in block[0]]
+        full_fund_names = [name for block in self.kept_blocks for name in block[1]]
+        number_of_columns = self.number_of_weeks + 1
+        profit_matrix = np.vstack([block[2] for block in self.kept_blocks] or [np.empty((0, number_of_columns - 1))])
+        price_matrix = np.vstack([block[3] for block in self.kept_blocks] or [np.empty((0, number_of_columns))])
+        # Stable sort by fund code, the same order sort_csv_by_fund gives the files
+        order = np.argsort(np.array(funds, dtype=object), kind='stable')
+
+        tables = {}
+        for path, columns, matrix in ((self.profit_csv_path, self.profit_columns, profit_matrix),
+                                      (self.price_csv_path, self.price_columns, price_matrix)):
+            table = pd.DataFrame(matrix[order], columns=columns)
+            table.insert(0, 'Full Fund Name', [full_fund_names[index] for index in order])
+            table.insert(0, 'Fund', [funds[index] for index in order])
+            tables[path] = table
+        return tables
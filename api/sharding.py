@@ -0,0 +1,50 @@
+import argparse
+import zlib
+from pathlib import Path
+from typing import List, Tuple
+
+# Shard outputs live in their own directory so the globs that look for the
+# merged outputs (time_analysis, excel_writer) never pick up a partial file
+SHARD_DIR_NAME = 'shards'
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Parse 'i/N' (1 <= i <= N) as used by --shard."""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, e.g. 2/4 (got {text!r})")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and N (got {text!r})")
+    return index, count
+
+
+def fund_hash(fund: str) -> int:
+    """Stable across processes and machines, unlike hash()."""
+    return zlib.crc32(fund.strip().upper().encode('utf-8'))
+
+
+def shard_funds(funds: List[str], index: int, count: int) -> List[str]:
+    """The funds of shard index (1-based) out of count, keeping their original order.
+
+    Funds are ordered by a stable hash of their code and dealt out round-robin,
+    so every runner computes the same split from fund_names.txt alone, each
+    fund lands in exactly one shard and shard sizes differ by at most one.
+    Repeated codes always land in the same shard.
+    """
+    codes = sorted({fund.strip().upper() for fund in funds}, key=lambda code: (fund_hash(code), code))
+    owned = {code for position, code in enumerate(codes) if position % count == index - 1}
+    return [fund for fund in funds if fund.strip().upper() in owned]
+
+
+def shard_tag(index: int, count: int) -> str:
+    return f'shard-{index}-of-{count}'
+
+
+def shard_output_path(script_dir: Path, base_name: str, index: int, count: int) -> Path:
+    """Where shard index writes the output that a single run calls {base_name}_{timestamp}.csv."""
+    return Path(script_dir) / SHARD_DIR_NAME / f'{base_name}.{shard_tag(index, count)}.csv'
+
+
+def shard_output_paths(script_dir: Path, base_name: str, count: int) -> List[Path]:
+    return [shard_output_path(script_dir, base_name, index, count) for index in range(1, count + 1)]
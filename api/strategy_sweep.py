@@ -0,0 +1,149 @@
+import itertools
+import os
+from multiprocessing import Pool, shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from rank_engine import RankEngine
+
+# Number of selected fund codes listed per combination in the summary
+LISTED_FUNDS = 10
+
+# Per-worker views of the shared matrices, set up by _init_worker
+_worker = {}
+
+
+def expand_week_sets(grid: dict, available_weeks: List[int]) -> List[Tuple[int, ...]]:
+    """Explicit week sets plus every combination of weeks_set_sizes horizons from weeks_pool.
+
+    Weeks missing from the profit table are dropped; duplicates are removed keeping the first occurrence.
+    """
+    available = set(available_weeks)
+    candidates = [tuple(weeks) for weeks in grid.get('weeks', [])]
+    pool = [week for week in grid.get('weeks_pool', []) if week in available]
+    for size in grid.get('weeks_set_sizes', []):
+        candidates.extend(itertools.combinations(pool, size))
+
+    week_sets = []
+    seen = set()
+    for weeks in candidates:
+        weeks = tuple(sorted(week for week in weeks if week in available))
+        if weeks and weeks not in seen:
+            seen.add(weeks)
+            week_sets.append(weeks)
+    return week_sets
+
+
+def build_combinations(grid: dict, week_sets: List[Tuple[int, ...]]) -> List[tuple]:
+    """All (weeks, top_n, min_appearances, exclusion name) combinations worth evaluating."""
+    combinations = []
+    for weeks, top_n, min_appearances, exclusion_name in itertools.product(
+            week_sets, grid['top_n'], grid['min_appearances'], list(grid['exclude_words'])):
+        if min_appearances <= len(weeks):
+            combinations.append((weeks, top_n, min_appearances, exclusion_name))
+    return combinations
+
+
+def _share(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, tuple]:
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach(spec: tuple) -> np.ndarray:
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    _worker.setdefault('handles', []).append(shm)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _init_worker(ranks_spec: tuple, values_spec: tuple, funds: List[str], exclusion_index: Dict[str, int],
+                 column_index: Dict[int, int]):
+    _worker['ranks'] = _attach(ranks_spec)
+    _worker['values'] = _attach(values_spec)
+    _worker['funds'] = funds
+    _worker['exclusion_index'] = exclusion_index
+    _worker['column_index'] = column_index
+
+
+def _evaluate(combination: tuple) -> dict:
+    weeks, top_n, min_appearances, exclusion_name = combination
+    columns = [_worker['column_index'][week] for week in weeks]
+    ranks = _worker['ranks'][_worker['exclusion_index'][exclusion_name]]
+    values = _worker['values']
+
+    appearances = (ranks[:, columns] < top_n).sum(axis=1)
+    selected = np.flatnonzero(appearances >= min_appearances)
+
+    row = {
+        'weeks': ' '.join(map(str, weeks)),
+        'top_n': top_n,
+        'min_appearances': min_appearances,
+        'exclude': exclusion_name,
+        'selected': len(selected),
+        'mean_appearances': np.nan,
+        'mean_profit': np.nan,
+        'mean_shortest_profit': np.nan,
+        'funds': '',
+    }
+    if len(selected):
+        selected_values = values[np.ix_(selected, columns)]
+        shortest = selected_values[:, 0]
+        # Same ordering as find_overlapping_funds: appearances, then the shortest horizon, both descending
+        order = np.lexsort((-np.nan_to_num(shortest, nan=-np.inf), -appearances[selected]))
+        with np.errstate(invalid='ignore'):
+            row['mean_appearances'] = float(appearances[selected].mean())
+            row['mean_profit'] = float(np.nanmean(selected_values)) if not np.isnan(selected_values).all() else np.nan
+            row['mean_shortest_profit'] = float(np.nanmean(shortest)) if not np.isnan(shortest).all() else np.nan
+        row['funds'] = ' '.join(_worker['funds'][selected[index]] for index in order[:LISTED_FUNDS])
+    return row
+
+
+def _evaluate_chunk(chunk: List[Tuple[int, tuple]]) -> List[dict]:
+    return [{'combination': combination_id, **_evaluate(combination)} for combination_id, combination in chunk]
+
+
+def run_sweep(df: pd.DataFrame, grid: dict, processes: Optional[int] = None, chunk_size: int = 500) -> pd.DataFrame:
+    """Evaluate every grid combination across a process pool and return one summary row per combination.
+
+    Filtered ranks are computed once per exclusion list in the parent; the rank
+    and profit matrices are placed in shared memory and read by the workers
+    without being pickled.
+    """
+    engine = RankEngine(df)
+    available_weeks = [int(col.split()[0]) for col in engine.columns]
+    week_sets = expand_week_sets(grid, available_weeks)
+    combinations = build_combinations(grid, week_sets)
+    print(f"Sweeping {len(combinations)} combinations ({len(week_sets)} week sets) "
+          f"over {len(df)} funds on {processes or os.cpu_count()} processes")
+
+    exclusion_names = list(grid['exclude_words'])
+    int32_max = np.iinfo(np.int32).max
+    ranks = np.stack([
+        np.minimum(engine.ranks(grid['exclude_words'][name], None), int32_max).astype(np.int32)
+        for name in exclusion_names
+    ])
+    column_index = {week: engine.column_index[f'{week} Weeks'] for week in available_weeks}
+
+    ranks_shm, ranks_spec = _share(ranks)
+    values_shm, values_spec = _share(engine.values)
+    try:
+        initargs = (ranks_spec, values_spec, df['Fund'].astype(str).tolist(),
+                    {name: index for index, name in enumerate(exclusion_names)}, column_index)
+        indexed = list(enumerate(combinations))
+        chunks = [indexed[start:start + chunk_size] for start in range(0, len(indexed), chunk_size)]
+        rows = []
+        with Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+            for chunk_rows in pool.imap_unordered(_evaluate_chunk, chunks):
+                rows.extend(chunk_rows)
+    finally:
+        for shm in (ranks_shm, values_shm):
+            shm.close()
+            shm.unlink()
+
+    summary = pd.DataFrame(rows)
+    if summary.empty:
+        return summary
+    return summary.sort_values('combination').drop(columns='combination').reset_index(drop=True)
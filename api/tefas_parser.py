@@ -0,0 +1,141 @@
+import json
+import sys
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# orjson is optional: it decodes large responses several times faster than json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fields of a BindHistoryInfo row that the pipeline reads
+PRICE_FIELDS = ['TARIH', 'FONKODU', 'FONUNVAN', 'FIYAT']
+
+MS_PER_DAY = 86_400_000
+
+
+def loads(body):
+    """Decode a JSON response body (bytes or str) with orjson when installed."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+class PriceHistory:
+    """The (fund, date, price, title) columns of a BindHistoryInfo response.
+
+    Dates are epoch days and prices float64 in preallocated NumPy arrays; fund
+    codes and titles are interned strings, so the thousands of rows sharing a
+    title point at one object. Everything else in the response is dropped.
+    """
+
+    __slots__ = ('codes', 'names', 'days', 'prices')
+
+    def __init__(self, codes: List[str], names: List[str], days: np.ndarray, prices: np.ndarray):
+        self.codes = codes
+        self.names = names
+        self.days = days
+        self.prices = prices
+
+    @classmethod
+    def empty(cls) -> 'PriceHistory':
+        return cls([], [], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+    @classmethod
+    def from_columns(cls, columns: Sequence[str], rows: Sequence[Sequence]) -> 'PriceHistory':
+        """Build from column names and row value lists, as stored in the response cache."""
+        count = len(rows)
+        if not count:
+            return cls.empty()
+        position = {column: index for index, column in enumerate(columns)}
+        tarih, code, name, fiyat = (position.get(field) for field in PRICE_FIELDS)
+        days = np.empty(count, dtype=np.int64)
+        prices = np.empty(count, dtype=np.float64)
+        codes = [''] * count
+        names = [''] * count
+        intern = sys.intern
+        for index, row in enumerate(rows):
+            days[index] = int(row[tarih]) // MS_PER_DAY
+            prices[index] = float(row[fiyat])
+            if code is not None and row[code] is not None:
+                codes[index] = intern(str(row[code]))
+            if name is not None and row[name] is not None:
+                names[index] = intern(str(row[name]))
+        return cls(codes, names, days, prices)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[dict]) -> 'PriceHistory':
+        """Build from the row dicts of a decoded response, reading only the needed fields."""
+        count = len(rows)
+        if not count:
+            return cls.empty()
+        days = np.empty(count, dtype=np.int64)
+        prices = np.empty(count, dtype=np.float64)
+        codes = [''] * count
+        names = [''] * count
+        intern = sys.intern
+        for index, row in enumerate(rows):
+            days[index] = int(row['TARIH']) // MS_PER_DAY
+            prices[index] = float(row['FIYAT'])
+            code = row.get('FONKODU')
+            if code is not None:
+                codes[index] = intern(str(code))
+            name = row.get('FONUNVAN')
+            if name is not None:
+                names[index] = intern(str(name))
+        return cls(codes, names, days, prices)
+
+    @classmethod
+    def concat(cls, histories: Iterable['PriceHistory']) -> 'PriceHistory':
+        histories = [history for history in histories if len(history)]
+        if not histories:
+            return cls.empty()
+        if len(histories) == 1:
+            return histories[0]
+        return cls([code for history in histories for code in history.codes],
+                   [name for history in histories for name in history.names],
+                   np.concatenate([history.days for history in histories]),
+                   np.concatenate([history.prices for history in histories]))
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def to_columns(self) -> Tuple[List[str], List[list]]:
+        """Column names and row value lists for the response cache (TARIH back in epoch milliseconds)."""
+        milliseconds = (self.days * MS_PER_DAY).tolist()
+        return PRICE_FIELDS, [list(row) for row in zip(milliseconds, self.codes, self.names, self.prices.tolist())]
+
+    def dates(self) -> List[date]:
+        return self.days.astype('datetime64[D]').tolist()
+
+    def unique_dates(self) -> List[date]:
+        return np.unique(self.days).astype('datetime64[D]').tolist()
+
+    def to_series(self) -> Tuple[Dict[date, float], str]:
+        """{date: price} of a single-fund response (later rows win) and the title of its last row."""
+        if not len(self):
+            return {}, ''
+        return dict(zip(self.dates(), self.prices.tolist())), self.names[-1]
+
+    def pivot(self) -> Tuple[pd.DataFrame, Dict[str, str]]:
+        """Funds x dates price matrix (NaN where no price) and {fund code: title} of a multi-fund response."""
+        if not len(self):
+            return pd.DataFrame(), {}
+        frame = pd.DataFrame({
+            'Fund': pd.Series(self.codes, dtype=object).str.strip().str.upper(),
+            'Date': self.dates(),
+            'Price': self.prices,
+            'Name': self.names,
+        })
+        matrix = frame.pivot_table(index='Fund', columns='Date', values='Price', aggfunc='last')
+        names = frame.groupby('Fund')['Name'].last().to_dict()
+        return matrix, names
+
+
+def parse_response(body) -> PriceHistory:
+    """Decode a BindHistoryInfo response body straight into a PriceHistory."""
+    return PriceHistory.from_rows(loads(body).get('data') or [])
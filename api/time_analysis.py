@@ -1,14 +1,19 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from typing import List, Dict, Tuple, Set, Optional
 from datetime import datetime
 import re
-from config import CONFIGS
+import argparse
+from config import CONFIGS, SWEEP_GRID
+from columnar_io import load_output_table
+from rank_engine import RankEngine
+from strategy_sweep import run_sweep
 
 def load_profit_data(file_path: Path) -> pd.DataFrame:
-    """Load the profit percentages CSV file."""
+    """Load the profit percentages file, preferring its typed Parquet copy when present."""
     try:
-        df = pd.read_csv(file_path)
+        df = load_output_table(file_path)
         print(f"Loaded {len(df)} funds from {file_path.name}")
         return df
     except FileNotFoundError:
@@ -18,17 +23,6 @@ def load_profit_data(file_path: Path) -> pd.DataFrame:
         print(f"Error loading file: {e}")
         return None
 
-def should_exclude_fund(fund_name: str, exclude_words: List[str]) -> bool:
-    """Check if fund name contains any excluded words (case-insensitive)."""
-    if not exclude_words:
-        return False
-
-    fund_name_upper = fund_name.upper()
-    for word in exclude_words:
-        if word.upper() in fund_name_upper:
-            return True
-    return False
-
 def get_column_name_for_week(df: pd.DataFrame, week_number: int) -> str:
     """Find the column name for a specific week number."""
     # Column format is like "4 Weeks", "12 Weeks", etc.
@@ -40,43 +34,8 @@ def get_column_name_for_week(df: pd.DataFrame, week_number: int) -> str:
     print(f"Warning: Column '{target_col}' not found. Available columns: {df.columns.tolist()[:5]}...")
     return None
 
-def get_top_funds_for_week(df: pd.DataFrame, week_col: str, top_n: int, exclude_words: List[str], particular_funds: Optional[List[str]]) -> set:
-    """Get the top N funds for a specific week column, with optional filtering."""
-    # Convert to numeric, handling 'None' and other non-numeric values
-    df_copy = df.copy()
-    df_copy[week_col] = pd.to_numeric(df_copy[week_col], errors='coerce')
-
-    # Remove NaN values
-    valid_funds = df_copy.dropna(subset=[week_col])
-
-    # Apply particular funds filter first (if specified)
-    if particular_funds is not None:
-        particular_funds_upper = [f.upper() for f in particular_funds]
-        original_count = len(valid_funds)
-        valid_funds = valid_funds[valid_funds['Fund'].str.upper().isin(particular_funds_upper)]
-        filtered_count = len(valid_funds)
-        if filtered_count < original_count:
-            print(f"    Filtered to {filtered_count} particular funds (from {original_count} total)")
-
-    # Apply exclusion filter (only if not using particular_funds)
-    elif exclude_words:
-        excluded_count = 0
-        mask = ~valid_funds['Full Fund Name'].apply(lambda x: should_exclude_fund(str(x), exclude_words))
-        excluded_count = len(valid_funds) - mask.sum()
-        valid_funds = valid_funds[mask]
-        if excluded_count > 0:
-            print(f"    Excluded {excluded_count} funds containing: {exclude_words}")
-
-    # Sort and get top N
-    top_funds = valid_funds.nlargest(top_n, week_col)
-
-    return set(top_funds['Fund'].values)
-
-def find_overlapping_funds(df: pd.DataFrame, weeks: List[int], top_n: int, min_appearances: int,
-                          exclude_words: List[str], particular_funds: Optional[List[str]]) -> pd.DataFrame:
-    """Find funds that appear in top N for at least min_appearances weeks."""
-
-    # Get column names for each week
+def week_columns_for(df: pd.DataFrame, weeks: List[int]) -> Dict[int, str]:
+    """Map each requested week to its profit column, skipping (and reporting) missing ones."""
     week_columns = {}
     for week in weeks:
         col_name = get_column_name_for_week(df, week)
@@ -84,51 +43,23 @@ def find_overlapping_funds(df: pd.DataFrame, weeks: List[int], top_n: int, min_a
             print(f"Skipping week {week} - column not found")
             continue
         week_columns[week] = col_name
+    return week_columns
 
-    if not week_columns:
-        print("Error: No valid week columns found")
-        return pd.DataFrame()
-
-    # Get top funds for each week (with filtering)
-    top_funds_per_week = {}
-    for week, col_name in week_columns.items():
-        top_funds = get_top_funds_for_week(df, col_name, top_n, exclude_words, particular_funds)
-        top_funds_per_week[week] = top_funds
-        print(f"  Week {week}: {len(top_funds)} top funds")
-
-    # Count appearances for each fund across all weeks
-    fund_appearance_count = {}
-    all_funds = set()
-    for week_funds in top_funds_per_week.values():
-        all_funds.update(week_funds)
-
-    for fund in all_funds:
-        count = sum(1 for week_set in top_funds_per_week.values() if fund in week_set)
-        fund_appearance_count[fund] = count
+def overlap_table(df: pd.DataFrame, engine: RankEngine, weeks: List[int], week_columns: Dict[int, str], top_n: int,
+                  min_appearances: int, exclude_words: List[str],
+                  particular_funds: Optional[List[str]]) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Funds in the top N of at least min_appearances week columns, and the funds x weeks top-N membership.
 
-    # Filter funds that meet minimum appearance threshold
-    qualifying_funds = {fund for fund, count in fund_appearance_count.items() if count >= min_appearances}
-
-    print(f"  Funds with at least {min_appearances} appearances: {len(qualifying_funds)}")
-
-    if not qualifying_funds:
-        return pd.DataFrame()
+    The table holds the fund, its name, the profit of each analyzed week and its
+    appearance count, sorted by appearances and then the shortest week's profit.
+    """
+    membership = engine.top_membership(list(week_columns.values()), top_n, exclude_words, particular_funds)
 
-    # Create result dataframe with qualifying funds
-    result_df = df[df['Fund'].isin(qualifying_funds)].copy()
-
-    # Double-check filters in final results (safety check)
-    if particular_funds is not None:
-        particular_funds_upper = [f.upper() for f in particular_funds]
-        original_count = len(result_df)
-        result_df = result_df[result_df['Fund'].str.upper().isin(particular_funds_upper)]
-        if len(result_df) < original_count:
-            print(f"  Removed {original_count - len(result_df)} non-particular funds from final results")
-    elif exclude_words:
-        original_count = len(result_df)
-        result_df = result_df[~result_df['Full Fund Name'].apply(lambda x: should_exclude_fund(str(x), exclude_words))]
-        if len(result_df) < original_count:
-            print(f"  Removed {original_count - len(result_df)} excluded funds from final results")
+    # Count appearances for each fund across all weeks and apply the threshold
+    appearances = membership.sum(axis=1)
+    qualifying = appearances >= min_appearances
+    if not qualifying.any():
+        return pd.DataFrame(), membership
 
     # Add columns showing the profit for each analyzed week
     analysis_columns = ['Fund', 'Full Fund Name']
@@ -136,41 +67,60 @@ def find_overlapping_funds(df: pd.DataFrame, weeks: List[int], top_n: int, min_a
         if week in week_columns:
             analysis_columns.append(week_columns[week])
 
-    # Add appearance count
-    appearance_counts = []
-    for fund in result_df['Fund']:
-        count = fund_appearance_count.get(fund, 0)
-        appearance_counts.append(count)
-    result_df['Appearances'] = appearance_counts
-
-    # Select and order columns
-    final_columns = analysis_columns + ['Appearances']
-    result_df = result_df[final_columns]
+    # Create result dataframe with qualifying funds and their appearance count
+    result_df = df.loc[qualifying, analysis_columns].copy()
+    result_df['Appearances'] = appearances[qualifying]
 
     # Sort by appearances first (descending), then by first week column (descending)
     first_week_col = week_columns[sorted(weeks)[0]]
     result_df[first_week_col] = pd.to_numeric(result_df[first_week_col], errors='coerce')
     result_df = result_df.sort_values(['Appearances', first_week_col], ascending=[False, False])
 
-    return result_df
+    return result_df, membership
 
-def cleanup_previous_output_files(script_dir: Path):
-    """Remove previous output files generated by this script only.
-
-    This function only deletes files that match the exact naming pattern
-    used by time_analysis.py: {base_name}_{timestamp}.csv
-    where base_name is one of: top_funds_0-36_weeks, top_funds_0-52_weeks,
-    top_funds_0-72_weeks, or my_portfolio_analysis.
+def find_overlapping_funds(df: pd.DataFrame, weeks: List[int], top_n: int, min_appearances: int,
+                          exclude_words: List[str], particular_funds: Optional[List[str]],
+                          engine: Optional[RankEngine] = None) -> pd.DataFrame:
+    """Find funds that appear in top N for at least min_appearances weeks.
 
-    Files from other scripts (e.g., excel_writer.py, configurable_weeks_sort.py)
-    are not affected as they use different naming patterns.
+    Pass a shared RankEngine to reuse column ranks and filter masks across configurations.
     """
-    # Get all base output file names from configurations
-    # These are the ONLY files this script generates
-    base_output_names = [config['output_file'] for config in CONFIGS.values()]
+    if engine is None:
+        engine = RankEngine(df)
+
+    # Get column names for each week
+    week_columns = week_columns_for(df, weeks)
+
+    if not week_columns:
+        print("Error: No valid week columns found")
+        return pd.DataFrame()
+
+    # Top-N membership for every analyzed week at once (with filtering)
+    result_df, membership = overlap_table(df, engine, weeks, week_columns, top_n, min_appearances,
+                                          exclude_words, particular_funds)
+    eligible = engine.eligible_mask(exclude_words, particular_funds)
+    for position, (week, col_name) in enumerate(week_columns.items()):
+        valid = engine.valid[:, engine.column_index[col_name]]
+        original_count = int(valid.sum())
+        filtered_count = int((valid & eligible).sum())
+        if particular_funds is not None:
+            if filtered_count < original_count:
+                print(f"    Filtered to {filtered_count} particular funds (from {original_count} total)")
+        elif exclude_words and filtered_count < original_count:
+            print(f"    Excluded {original_count - filtered_count} funds containing: {exclude_words}")
+        print(f"  Week {week}: {int(membership[:, position].sum())} top funds")
+
+    print(f"  Funds with at least {min_appearances} appearances: {len(result_df)}")
 
+    return result_df
+
+def remove_timestamped_outputs(script_dir: Path, base_names: List[str]) -> int:
+    """Delete earlier {stem}_{YYYY-MM-DD_HH-MM-SS}{suffix} outputs of the given base file names.
+
+    Returns the number of files deleted.
+    """
     deleted_count = 0
-    for base_name in base_output_names:
+    for base_name in base_names:
         # Extract the base name without extension
         base_path = Path(base_name)
         base_stem = base_path.stem  # e.g., 'top_funds_0-36_weeks'
@@ -189,40 +139,73 @@ def cleanup_previous_output_files(script_dir: Path):
                     print(f"  Deleted previous output: {file_path.name}")
                 except Exception as e:
                     print(f"  Warning: Could not delete {file_path.name}: {e}")
+    return deleted_count
 
-    if deleted_count > 0:
-        print(f"Cleaned up {deleted_count} previous output file(s)\n")
-    else:
-        print("No previous output files to clean up\n")
+def cleanup_previous_output_files(script_dir: Path):
+    """Remove previous output files generated by this script only.
 
-def main():
-    # Get script directory
-    script_dir = Path(__file__).parent
+    This function only deletes files that match the exact naming pattern
+    used by time_analysis.py: {base_name}_{timestamp}.csv
+    where base_name is one of: top_funds_0-36_weeks, top_funds_0-52_weeks,
+    top_funds_0-72_weeks, or my_portfolio_analysis.
 
-    # Clean up previous output files from this script
-    print("Cleaning up previous output files...")
-    cleanup_previous_output_files(script_dir)
+    Files from other scripts (e.g., excel_writer.py, configurable_weeks_sort.py)
+    are not affected as they use different naming patterns.
+    """
+    # Get all base output file names from configurations
+    # These are the ONLY files this script generates
+    base_output_names = [config['output_file'] for config in CONFIGS.values()]
 
-    # Find the most recent all_fund_profit_percentages_api file
-    profit_files = list(script_dir.glob('all_fund_profit_percentages_api*.csv'))
-    if not profit_files:
-        print("Error: No all_fund_profit_percentages_api CSV file found in the directory.")
-        return
+    deleted_count = remove_timestamped_outputs(script_dir, base_output_names)
 
-    # Get the most recent file by modification time
-    input_file = max(profit_files, key=lambda p: p.stat().st_mtime)
-    print(f"Using input file: {input_file.name}")
+    if deleted_count > 0:
+        print(f"Cleaned up {deleted_count} previous output file(s)\n")
+    else:
+        print("No previous output files to clean up\n")
 
-    # Load data
-    print("Loading profit data...")
-    df = load_profit_data(input_file)
+# Fetch outputs carry their creation time in the name: all_fund_profit_percentages_api_{YYYY-MM-DD_HH-MM-SS}.csv
+PROFIT_FILE_PATTERN = re.compile(r'^all_fund_profit_percentages_api_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})\.csv$')
 
-    if df is None or df.empty:
-        print("Failed to load data. Exiting.")
-        return
+def find_latest_profit_file(script_dir: Path) -> Optional[Path]:
+    """Return the newest fetch output by the timestamp in its name.
 
-    # Generate timestamp for filenames
-    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    Modification times are not used: they change when files are copied,
+    restored from a cache or downloaded as artifacts.
+    """
+    candidates = []
+    for file_path in script_dir.glob('all_fund_profit_percentages_api*.csv'):
+        match = PROFIT_FILE_PATTERN.match(file_path.name)
+        if match:
+            candidates.append((match.group(1), file_path.name, file_path))
+    if not candidates:
+        return None
+    return max(candidates)[2]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Find funds that rank in the top N across several horizons.')
+    parser.add_argument('--input', type=Path, default=None,
+                        help='profit percentages CSV to analyze (default: the newest fetch output)')
+    parser.add_argument('--sweep', action='store_true',
+                        help='evaluate the SWEEP_GRID from config.py instead of CONFIGS and write one summary table')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes for --sweep (default: all cores)')
+    return parser.parse_args(argv)
+
+def run_parameter_sweep(df: pd.DataFrame, script_dir: Path, timestamp: str, processes: Optional[int]):
+    """Run the SWEEP_GRID over the profit table and save the summary table."""
+    summary = run_sweep(df, SWEEP_GRID, processes=processes)
+    # Keep only the latest sweep summary: excel_writer turns every CSV here into a sheet
+    remove_timestamped_outputs(script_dir, [SWEEP_GRID['output_file']])
+    output_path = Path(SWEEP_GRID['output_file'])
+    output_path = script_dir / f"{output_path.stem}_{timestamp}{output_path.suffix}"
+    summary.to_csv(output_path, index=False, encoding='utf-8')
+    print(f"Saved {len(summary)} sweep results to {output_path.name}")
+
+def run_configs(df: pd.DataFrame, script_dir: Path, timestamp: str) -> Dict[Path, pd.DataFrame]:
+    """Run every configuration, save each result and return them keyed by output path."""
+    # Ranks are computed once and shared by every configuration
+    engine = RankEngine(df)
+    outputs = {}
 
     # Process each configuration
     for config_name, config in CONFIGS.items():
@@ -249,7 +232,8 @@ def main():
             top_n,
             min_appearances,
             exclude_words,
-            particular_funds
+            particular_funds,
+            engine=engine
         )
 
         if result_df.empty:
@@ -264,6 +248,7 @@ def main():
         # Save to CSV
         result_df.to_csv(output_path, index=False, encoding='utf-8')
         print(f"  Saved {len(result_df)} funds to {output_path.name}")
+        outputs[output_path] = result_df
 
         # Show top 10 (or all if less than 10)
         display_count = min(10, len(result_df))
@@ -272,6 +257,48 @@ def main():
             print(f"    {row['Fund']} (appears {int(row['Appearances'])}x)")
 
     print("\nAnalysis complete!")
+    return outputs
+
+def main(args=None, df: Optional[pd.DataFrame] = None) -> Dict[Path, pd.DataFrame]:
+    """Run the analysis and return the saved results keyed by output path.
+
+    A profit table passed as df (e.g. straight from the fetch stage) is used
+    as is; otherwise it is loaded from --input or the newest fetch output.
+    """
+    if args is None:
+        args = parse_args()
+
+    # Get script directory
+    script_dir = Path(__file__).parent
+
+    # Clean up previous output files from this script (a sweep leaves them in place)
+    if not args.sweep:
+        print("Cleaning up previous output files...")
+        cleanup_previous_output_files(script_dir)
+
+    if df is None:
+        input_file = args.input or find_latest_profit_file(script_dir)
+        if input_file is None:
+            print("Error: No all_fund_profit_percentages_api CSV file found in the directory.")
+            return {}
+        print(f"Using input file: {input_file.name}")
+
+        # Load data
+        print("Loading profit data...")
+        df = load_profit_data(input_file)
+
+    if df is None or df.empty:
+        print("Failed to load data. Exiting.")
+        return {}
+
+    # Generate timestamp for filenames
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+
+    if args.sweep:
+        run_parameter_sweep(df, script_dir, timestamp, args.processes)
+        return {}
+
+    return run_configs(df, script_dir, timestamp)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,95 @@
+from bisect import bisect_right
+from datetime import datetime, date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+# Public holidays on fixed dates (month, day) when TEFAS publishes no prices
+FIXED_HOLIDAYS = [(1, 1), (4, 23), (5, 1), (5, 19), (7, 15), (8, 30), (10, 29)]
+
+# Ramazan and Kurban Bayramı: (first day, number of days). Arife half days are trading days.
+RELIGIOUS_HOLIDAYS = {
+    2023: [(date(2023, 4, 21), 3), (date(2023, 6, 28), 4)],
+    2024: [(date(2024, 4, 10), 3), (date(2024, 6, 16), 4)],
+    2025: [(date(2025, 3, 30), 3), (date(2025, 6, 6), 4)],
+    2026: [(date(2026, 3, 20), 3), (date(2026, 5, 27), 4)],
+    2027: [(date(2027, 3, 9), 3), (date(2027, 5, 16), 4)],
+}
+
+
+def as_date(value) -> date:
+    """Normalize a datetime/date to a plain date."""
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def turkish_holidays(year: int) -> set:
+    """Return the set of market holidays for a year from the local holiday table."""
+    holidays = {date(year, month, day) for month, day in FIXED_HOLIDAYS}
+    for first_day, length in RELIGIOUS_HOLIDAYS.get(year, []):
+        holidays.update(first_day + timedelta(days=offset) for offset in range(length))
+    return holidays
+
+
+class TradingCalendar:
+    """TEFAS trading days from the holiday table, refined by days actually observed in fetched data.
+
+    A day seen in fetched data is always a trading day. A day inside a date range
+    that was fully fetched but never seen is not. Any other day falls back to the
+    weekday and holiday rules.
+    """
+
+    def __init__(self):
+        self._holidays: Dict[int, set] = {}
+        self._observed = set()
+        self._covered_ranges = []
+        self._lookback_cache: Dict[tuple, date] = {}
+
+    def add_observed_days(self, days: Iterable, covered_start=None, covered_end=None):
+        """Record trading days seen in a response that covered [covered_start, covered_end]."""
+        self._observed.update(as_date(day) for day in days)
+        if covered_start is not None and covered_end is not None:
+            self._covered_ranges.append((as_date(covered_start), as_date(covered_end)))
+        self._lookback_cache.clear()
+
+    def is_holiday(self, day) -> bool:
+        day = as_date(day)
+        if day.year not in self._holidays:
+            self._holidays[day.year] = turkish_holidays(day.year)
+        return day in self._holidays[day.year]
+
+    def is_trading_day(self, day) -> bool:
+        day = as_date(day)
+        if day in self._observed:
+            return True
+        if any(start <= day <= end for start, end in self._covered_ranges):
+            return False
+        return day.weekday() < 5 and not self.is_holiday(day)
+
+    def previous_trading_day(self, day) -> date:
+        """Return the last trading day on or before day."""
+        day = as_date(day)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def previous_trading_days(self, day, count: int) -> List[date]:
+        """Return the last count trading days on or before day, most recent first."""
+        days = [self.previous_trading_day(day)]
+        while len(days) < count:
+            days.append(self.previous_trading_day(days[-1] - timedelta(days=1)))
+        return days
+
+    def earliest_acceptable_day(self, day, lookback_days: int) -> date:
+        """Return the oldest day whose price may still stand in for day (its lookback_days-th trading day)."""
+        key = (as_date(day), lookback_days)
+        if key not in self._lookback_cache:
+            self._lookback_cache[key] = self.previous_trading_days(day, lookback_days)[-1]
+        return self._lookback_cache[key]
+
+    def asof(self, sorted_days: List[date], day, lookback_days: int) -> Optional[int]:
+        """Index of the last day in sorted_days on or before day, if within lookback_days trading days."""
+        day = as_date(day)
+        index = bisect_right(sorted_days, day) - 1
+        if index >= 0 and sorted_days[index] >= self.earliest_acceptable_day(day, lookback_days):
+            return index
+        return None
@@ -0,0 +1,98 @@
+import re
+from typing import Dict, Iterable, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from rank_engine import filtered_ranks
+
+WEEK_COLUMN = re.compile(r'^(\d+) Weeks$')
+
+
+def anchored_window_means(values: np.ndarray, lengths: Iterable[int], min_valid: int = 1) -> np.ndarray:
+    """Mean of the last `length` columns of values for every row and every length, in one pass.
+
+    values is funds x weeks, oldest-to-newest in the sense that windows end at
+    the last column. Running sums and counts of the non-NaN cells are
+    accumulated once from the last column backwards, so a window of any length
+    is a single lookup. NaN weeks are skipped; a window with fewer than
+    min_valid valid weeks is NaN. Returns funds x lengths.
+    """
+    lengths = list(lengths)
+    valid = ~np.isnan(values)
+    # Reverse so column k holds the sum over the last k + 1 weeks
+    sums = np.cumsum(np.where(valid, values, 0.0)[:, ::-1], axis=1)
+    counts = np.cumsum(valid[:, ::-1], axis=1)
+    positions = np.array(lengths, dtype=np.int64) - 1
+    window_sums = sums[:, positions]
+    window_counts = counts[:, positions]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = window_sums / window_counts
+    means[window_counts < max(min_valid, 1)] = np.nan
+    return means
+
+
+class WindowEngine:
+    """Top-N screens on weekly profit averages over windows ending at the longest horizon.
+
+    The "N Weeks" columns are ordered by week number once; window means and
+    their ranks are computed once per window length and shared by every
+    (length, top N) period and every period set that uses it.
+    """
+
+    def __init__(self, df: pd.DataFrame, min_valid: int = 1):
+        self.df = df
+        self.min_valid = min_valid
+        weeks = []
+        for col in df.columns:
+            match = WEEK_COLUMN.match(str(col))
+            if match:
+                weeks.append((int(match.group(1)), col))
+        weeks.sort()
+        self.week_numbers = [week for week, _ in weeks]
+        self.values = np.column_stack([pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+                                       for _, col in weeks]) if weeks else np.empty((len(df), 0))
+        self.eligible = np.ones(len(df), dtype=bool)
+        self._ranks: Dict[int, np.ndarray] = {}
+
+    def check_length(self, length: int):
+        """A window of `length` weeks must cover consecutive week columns ending at the last one."""
+        if not 1 <= length <= len(self.week_numbers):
+            raise KeyError(f'{length}-week window does not fit in {len(self.week_numbers)} week columns')
+        window = self.week_numbers[-length:]
+        if window != list(range(window[0], window[0] + length)):
+            raise KeyError(f'week columns for the {length}-week window are not consecutive')
+
+    def ranks(self, lengths: Sequence[int]) -> np.ndarray:
+        """Funds x lengths rank (0 = best average) of each window; missing means rank last."""
+        missing = sorted({length for length in lengths if length not in self._ranks})
+        if missing:
+            for length in missing:
+                self.check_length(length)
+            means = anchored_window_means(self.values, missing, self.min_valid)
+            ranks = filtered_ranks(means, self.eligible)
+            for position, length in enumerate(missing):
+                self._ranks[length] = ranks[:, position]
+        if not lengths:
+            return np.empty((len(self.df), 0), dtype=np.int64)
+        return np.column_stack([self._ranks[length] for length in lengths])
+
+    def top_mask(self, periods: Sequence[Tuple[int, int]]) -> np.ndarray:
+        """Funds in the top N of every (window length, top N) period, matching nlargest(keep='first')."""
+        ranks = self.ranks([length for length, _ in periods])
+        top_n = np.array([top_n for _, top_n in periods])
+        return (ranks < top_n).all(axis=1)
+
+    def evaluate_period_sets(self, period_sets: Sequence[Sequence[Tuple[int, int]]]) -> pd.DataFrame:
+        """One row per period set: how many funds pass all its periods, and which."""
+        self.ranks(sorted({length for periods in period_sets for length, _ in periods}))
+        funds = self.df['Fund'].astype(str).to_numpy()
+        rows = []
+        for periods in period_sets:
+            selected = funds[self.top_mask(periods)]
+            rows.append({
+                'periods': ' '.join(f'{length}:{top_n}' for length, top_n in periods),
+                'selected': len(selected),
+                'funds': ' '.join(selected),
+            })
+        return pd.DataFrame(rows)
@@ -0,0 +1,236 @@
+"""Local stand-in for the TEFAS BindHistoryInfo endpoint.
+
+Serves deterministic synthetic daily prices for N funds so the fetchers can be
+measured offline. Latency, holidays, missing days, 429/5xx responses, range
+limits and per-connection rate limits are all configurable. Extra closed days
+(--holidays) and serving the built-in holiday table as trading days
+(--no-holiday-table) exercise the calendar and liveness paths on dates the
+fetcher does not know in advance.
+
+    python bench/fake_tefas_server.py --funds 500 --latency-ms 80 --error-5xx 0.01
+    TEFAS_URL=http://127.0.0.1:8765/api/DB/BindHistoryInfo python api/async.py
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+import sys
+import time
+from datetime import datetime, date, timedelta, timezone
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from price_history import MAX_RANGE_DAYS  # noqa: E402
+from trading_calendar import TradingCalendar  # noqa: E402
+
+ENDPOINT = '/api/DB/BindHistoryInfo'
+
+
+def stable_fraction(*parts) -> float:
+    """Deterministic pseudo-random number in [0, 1) derived from parts."""
+    digest = hashlib.blake2b('|'.join(map(str, parts)).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+def parse_holidays(spec: str) -> set:
+    """Dates from a comma-separated YYYY-MM-DD list or a file with one date per line ('#' starts a comment)."""
+    path = Path(spec)
+    text = path.read_text(encoding='utf-8') if path.is_file() else spec.replace(',', '\n')
+    holidays = set()
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if line:
+            holidays.add(date.fromisoformat(line))
+    return holidays
+
+
+class FakeTefas:
+    """Synthetic fund universe and the request handling policy applied to it."""
+
+    def __init__(self, funds, history_days=600, latency_ms=50.0, latency_sigma=0.5, missing_rate=0.0,
+                 dead_rate=0.0, error_429_rate=0.0, error_5xx_rate=0.0, connection_rps=0.0, seed=0,
+                 holidays=(), holiday_table=True):
+        self.funds = funds
+        self.history_days = history_days
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.missing_rate = missing_rate
+        self.error_429_rate = error_429_rate
+        self.error_5xx_rate = error_5xx_rate
+        self.connection_rps = connection_rps
+        self.calendar = TradingCalendar()
+        self.holidays = set(holidays)
+        self.holiday_table = holiday_table
+        self.random = random.Random(seed)
+        self.seed = seed
+        self.connection_buckets = {}
+        self.stats = {'requests': 0, 'rows': 0, 'status': {}}
+
+        # Each fund lives over [launch, close]; dead funds closed or launched inside the history window
+        today = date.today()
+        self.first_day = today - timedelta(days=history_days)
+        self.lifetimes = {}
+        for fund in funds:
+            launch, close = self.first_day - timedelta(days=3650), today
+            if stable_fraction(seed, 'dead', fund) < dead_rate:
+                split = self.first_day + timedelta(days=int(stable_fraction(seed, 'split', fund) * history_days))
+                if stable_fraction(seed, 'side', fund) < 0.5:
+                    close = split
+                else:
+                    launch = split
+            self.lifetimes[fund] = (launch, close)
+
+    def is_closed(self, day: date) -> bool:
+        """Weekends, the extra holidays and (unless disabled) the built-in holiday table."""
+        if day.weekday() >= 5 or day in self.holidays:
+            return True
+        return self.holiday_table and self.calendar.is_holiday(day)
+
+    def price(self, fund: str, day: date) -> float:
+        base = 1 + 50 * stable_fraction(self.seed, 'base', fund)
+        drift = (stable_fraction(self.seed, 'drift', fund) - 0.3) / 1000
+        days = (day - self.first_day).days
+        wobble = 0.02 * math.sin(days / 7 + 10 * stable_fraction(self.seed, 'phase', fund))
+        return round(base * math.exp(drift * days) * (1 + wobble), 6)
+
+    def rows(self, funds, start: date, end: date):
+        rows = []
+        day = start
+        while day <= end:
+            if not self.is_closed(day):
+                millis = str(int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000))
+                for fund in funds:
+                    launch, close = self.lifetimes.get(fund, (None, None))
+                    if launch is None or not launch <= day <= close:
+                        continue
+                    if stable_fraction(self.seed, 'missing', fund, day) < self.missing_rate:
+                        continue
+                    rows.append({
+                        'TARIH': millis,
+                        'FONKODU': fund,
+                        'FONUNVAN': f'{fund} SYNTHETIC FUND',
+                        'FIYAT': self.price(fund, day),
+                        'TEDPAYSAYISI': 1000000.0,
+                        'KISISAYISI': 100,
+                        'PORTFOYBUYUKLUK': 1000000.0,
+                        'BORSABULTENFIYAT': '-',
+                    })
+            day += timedelta(days=1)
+        return rows
+
+    def connection_allowed(self, peer) -> bool:
+        """Token bucket per TCP connection, refilled at connection_rps."""
+        if self.connection_rps <= 0:
+            return True
+        now = time.monotonic()
+        tokens, updated = self.connection_buckets.get(peer, (self.connection_rps, now))
+        tokens = min(self.connection_rps, tokens + (now - updated) * self.connection_rps)
+        allowed = tokens >= 1
+        self.connection_buckets[peer] = (tokens - 1 if allowed else tokens, now)
+        return allowed
+
+    def respond(self, status: int, body):
+        self.stats['status'][status] = self.stats['status'].get(status, 0) + 1
+        if status == 200:
+            return web.json_response(body)
+        return web.Response(status=status, text=body)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.stats['requests'] += 1
+        form = await request.post()
+        latency = self.random.lognormvariate(math.log(self.latency_ms / 1000), self.latency_sigma)
+        await asyncio.sleep(latency)
+
+        if not self.connection_allowed(request.transport.get_extra_info('peername') if request.transport else None):
+            return self.respond(429, 'Too Many Requests')
+        roll = self.random.random()
+        if roll < self.error_429_rate:
+            return self.respond(429, 'Too Many Requests')
+        if roll < self.error_429_rate + self.error_5xx_rate:
+            return self.respond(self.random.choice([500, 502, 503]), 'Server Error')
+
+        try:
+            start = datetime.strptime(form['bastarih'], '%d.%m.%Y').date()
+            end = datetime.strptime(form['bittarih'], '%d.%m.%Y').date()
+        except (KeyError, ValueError):
+            return self.respond(400, 'Bad Request')
+        if (end - start).days + 1 > MAX_RANGE_DAYS:
+            return self.respond(400, 'Date range too long')
+
+        fund = form.get('fonkod', '').strip().upper()
+        rows = self.rows([fund] if fund else self.funds, start, end)
+        self.stats['rows'] += len(rows)
+        return self.respond(200, {'draw': 0, 'recordsTotal': len(rows), 'recordsFiltered': len(rows), 'data': rows})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats, 'status': {str(k): v for k, v in self.stats['status'].items()}})
+
+
+def synthetic_fund_codes(count: int):
+    """Fund codes from fund_names.txt, padded with generated codes if count is larger."""
+    fund_names_path = Path(__file__).resolve().parent.parent / 'api' / 'fund_names.txt'
+    codes = [line.strip() for line in fund_names_path.read_text(encoding='utf-8').splitlines() if line.strip()]
+    index = 0
+    while len(codes) < count:
+        codes.append(f'X{index:03d}')
+        index += 1
+    return codes[:count]
+
+
+def build_app(server: FakeTefas) -> web.Application:
+    app = web.Application()
+    app.router.add_post(ENDPOINT, server.handle)
+    app.router.add_get('/stats', server.handle_stats)
+    return app
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--funds', type=int, default=200, help='number of synthetic funds')
+    parser.add_argument('--history-days', type=int, default=600, help='days of history to serve')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='median response latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='lognormal latency spread')
+    parser.add_argument('--missing-rate', type=float, default=0.0, help='share of (fund, day) prices left out')
+    parser.add_argument('--dead-rate', type=float, default=0.0, help='share of funds closed or launched mid-history')
+    parser.add_argument('--error-429', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--error-5xx', type=float, default=0.0, help='share of requests answered with 5xx')
+    parser.add_argument('--connection-rps', type=float, default=0.0, help='per-connection request rate limit (0 disables it)')
+    parser.add_argument('--seed', type=int, default=0, help='seed for latency, errors and synthetic prices')
+    parser.add_argument('--holidays', default='',
+                        help='extra closed days: comma-separated YYYY-MM-DD dates or a file with one date per line')
+    parser.add_argument('--no-holiday-table', action='store_true',
+                        help="serve the built-in holiday table's days as trading days")
+
+
+def server_from_args(args) -> FakeTefas:
+    return FakeTefas(
+        synthetic_fund_codes(args.funds),
+        history_days=args.history_days,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        missing_rate=args.missing_rate,
+        dead_rate=args.dead_rate,
+        error_429_rate=args.error_429,
+        error_5xx_rate=args.error_5xx,
+        connection_rps=args.connection_rps,
+        seed=args.seed,
+        holidays=parse_holidays(args.holidays) if args.holidays else (),
+        holiday_table=not args.no_holiday_table,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local fake TEFAS BindHistoryInfo server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"Serving {args.funds} synthetic funds on http://{args.host}:{args.port}{ENDPOINT}", flush=True)
+    web.run_app(build_app(server_from_args(args)), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
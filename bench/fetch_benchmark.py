@@ -0,0 +1,168 @@
+"""End-to-end benchmark of api/async.py against the local fake TEFAS server.
+
+Starts bench/fake_tefas_server.py in a subprocess, runs the fetch stage against
+it in-process and reports requests/s, wall time, retries and latency
+percentiles measured on the client side.
+
+    python bench/fetch_benchmark.py --funds 300 --mode range --latency-ms 80 --error-429 0.02
+    python bench/fetch_benchmark.py --funds 300 --mode daily -- --concurrency 30 --rps 100
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / 'api'))
+sys.path.insert(0, str(BENCH_DIR))
+from fake_tefas_server import ENDPOINT, add_server_arguments, synthetic_fund_codes  # noqa: E402
+
+# async.py is not importable with a plain import statement
+fetcher = importlib.import_module('async')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, port: int) -> subprocess.Popen:
+    server_args = [sys.executable, str(BENCH_DIR / 'fake_tefas_server.py'), '--port', str(port),
+                   '--funds', str(args.funds), '--history-days', str(args.history_days),
+                   '--latency-ms', str(args.latency_ms), '--latency-sigma', str(args.latency_sigma),
+                   '--missing-rate', str(args.missing_rate), '--dead-rate', str(args.dead_rate),
+                   '--error-429', str(args.error_429), '--error-5xx', str(args.error_5xx),
+                   '--connection-rps', str(args.connection_rps), '--seed', str(args.seed)]
+    if args.holidays:
+        server_args += ['--holidays', args.holidays]
+    if args.no_holiday_table:
+        server_args.append('--no-holiday-table')
+    process = subprocess.Popen(server_args, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/stats', timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('fake TEFAS server did not start')
+
+
+def request_tracer(samples: dict) -> aiohttp.TraceConfig:
+    """Record per-request latency, status codes and exceptions."""
+    async def on_start(session, context, params):
+        context.started = time.perf_counter()
+
+    async def on_end(session, context, params):
+        samples['latencies'].append(time.perf_counter() - context.started)
+        status = params.response.status
+        samples['status'][status] = samples['status'].get(status, 0) + 1
+
+    async def on_exception(session, context, params):
+        samples['latencies'].append(time.perf_counter() - context.started)
+        name = type(params.exception).__name__
+        samples['exceptions'][name] = samples['exceptions'].get(name, 0) + 1
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_start)
+    trace_config.on_request_end.append(on_end)
+    trace_config.on_request_exception.append(on_exception)
+    return trace_config
+
+
+async def run_fetch(fetch_args, funds):
+    today = datetime.now() - timedelta(days=1)
+    if today.weekday() > 4:
+        today = fetcher.get_previous_friday(today)
+    week_dates = [today - timedelta(weeks=week) for week in range(1, 75)]
+
+    samples = {'latencies': [], 'status': {}, 'exceptions': {}}
+    started = time.perf_counter()
+    results = await fetcher.fetch_results(fetch_args, funds, today, week_dates, trace_configs=[request_tracer(samples)])
+    wall_time = time.perf_counter() - started
+
+    priced_cells = sum(int(np.count_nonzero(~np.isnan(prices))) for _, _, prices in results)
+    return samples, wall_time, priced_cells, len(results) * (len(week_dates) + 1)
+
+
+def build_report(args, samples, wall_time, priced_cells, total_cells) -> dict:
+    latencies = np.array(samples['latencies']) * 1000
+    requests = len(latencies)
+    successes = samples['status'].get(200, 0)
+    return {
+        'mode': args.mode,
+        'funds': args.funds,
+        'requests': requests,
+        'wall_time_s': round(wall_time, 3),
+        'requests_per_s': round(requests / wall_time, 1) if wall_time else 0.0,
+        'retries': requests - successes,
+        'status': {str(status): count for status, count in sorted(samples['status'].items())},
+        'exceptions': samples['exceptions'],
+        'latency_ms': {
+            f'p{q}': round(float(np.percentile(latencies, q)), 1) if requests else None
+            for q in (50, 95, 99)
+        },
+        'priced_cells': f'{priced_cells}/{total_cells}',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the fetch stage against a local fake TEFAS server.',
+                                     epilog='Arguments after -- are passed to async.py (e.g. -- --concurrency 30).')
+    parser.add_argument('--mode', choices=['range', 'bulk', 'update', 'daily'], default='range')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    add_server_arguments(parser)
+    argv = sys.argv[1:]
+    fetch_argv = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, fetch_argv = argv[:split], argv[split + 1:]
+    args = parser.parse_args(argv)
+
+    port = free_port()
+    server = start_server(args, port)
+    try:
+        fetcher.TEFAS_URL = f'http://127.0.0.1:{port}{ENDPOINT}'
+        with tempfile.TemporaryDirectory() as work_dir:
+            # Fresh cache, store and liveness registry per run so results are comparable unless the caller points elsewhere
+            fetch_args = fetcher.parse_args(['--mode', args.mode,
+                                             '--cache-dir', str(Path(work_dir) / 'cache'),
+                                             '--store', str(Path(work_dir) / 'prices.sqlite'),
+                                             '--liveness', str(Path(work_dir) / 'liveness.json')] + fetch_argv)
+            funds = synthetic_fund_codes(args.funds)
+            samples, wall_time, priced_cells, total_cells = asyncio.run(run_fetch(fetch_args, funds))
+        server_stats = json.loads(urllib.request.urlopen(f'http://127.0.0.1:{port}/stats').read())
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = build_report(args, samples, wall_time, priced_cells, total_cells)
+    report['server'] = server_stats
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"\nMode: {report['mode']}  funds: {report['funds']}")
+    print(f"  Wall time:   {report['wall_time_s']:.2f}s")
+    print(f"  Requests:    {report['requests']} ({report['requests_per_s']} req/s), retries: {report['retries']}")
+    print(f"  Status:      {report['status']}  exceptions: {report['exceptions']}")
+    latency = report['latency_ms']
+    print(f"  Latency:     p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms")
+    print(f"  Priced:      {report['priced_cells']} cells")
+
+
+if __name__ == '__main__':
+    main()
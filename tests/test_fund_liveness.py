@@ -0,0 +1,63 @@
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from fund_liveness import EPOCH, FundLiveness  # noqa: E402
+from tefas_parser import PriceHistory  # noqa: E402
+
+RUN_DATE = date(2026, 10, 16)
+
+
+def history(code, days):
+    return PriceHistory([code] * len(days), [f'{code} FUND'] * len(days),
+                        np.array([(day - EPOCH).days for day in days], dtype=np.int64),
+                        np.ones(len(days), dtype=np.float64))
+
+
+def weekdays(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)
+            if (start + timedelta(days=offset)).weekday() < 5]
+
+
+def test_out_of_order_single_day_probes_do_not_delist(tmp_path):
+    liveness = FundLiveness(tmp_path / 'liveness.json', RUN_DATE)
+    liveness.observe('ABC', date(2026, 8, 7), date(2026, 8, 7), history('ABC', [date(2026, 8, 7)]))
+    liveness.observe('ABC', date(2026, 9, 4), date(2026, 9, 4), PriceHistory.empty())
+    assert liveness.allows('ABC', date(2026, 10, 9))
+
+    liveness.observe('ABC', date(2026, 10, 9), date(2026, 10, 9), history('ABC', [date(2026, 10, 9)]))
+    liveness.save()
+    assert liveness.funds['ABC']['delisted'] is None
+    assert not liveness.delisted_now and not liveness.relisted_now
+
+
+def test_empty_range_before_later_prices_does_not_delist(tmp_path):
+    liveness = FundLiveness(tmp_path / 'liveness.json', RUN_DATE)
+    liveness.observe('ABC', date(2026, 1, 1), date(2026, 3, 31),
+                     history('ABC', weekdays(date(2026, 1, 1), date(2026, 3, 31))))
+    liveness.observe('ABC', date(2026, 4, 1), date(2026, 6, 30), PriceHistory.empty())
+    liveness.observe('ABC', date(2026, 7, 1), date(2026, 9, 30),
+                     history('ABC', weekdays(date(2026, 7, 1), date(2026, 9, 30))))
+    liveness.save()
+    assert liveness.funds['ABC']['delisted'] is None
+    assert not liveness.delisted_now and not liveness.relisted_now
+
+
+def test_delisting_is_settled_at_save_and_gates_the_next_run(tmp_path):
+    path = tmp_path / 'liveness.json'
+    liveness = FundLiveness(path, RUN_DATE)
+    liveness.observe('ABC', date(2026, 7, 1), date(2026, 9, 30), PriceHistory.empty())
+    assert liveness.allows('ABC', date(2026, 10, 9))
+    liveness.observe('ABC', date(2026, 4, 1), date(2026, 6, 30),
+                     history('ABC', weekdays(date(2026, 4, 1), date(2026, 6, 19))))
+    assert liveness.allows('ABC', date(2026, 10, 9))
+    liveness.save()
+    assert liveness.funds['ABC']['delisted'] == date(2026, 6, 19)
+    assert liveness.delisted_now == {'ABC'}
+
+    next_run = FundLiveness(path, RUN_DATE + timedelta(days=1))
+    assert next_run.allows('ABC', date(2026, 6, 19))
+    assert not next_run.allows('ABC', date(2026, 10, 9))
@@ -0,0 +1,45 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pandas as pd
+from aiohttp.test_utils import TestClient, TestServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+from query_server import QueryServer, Snapshot, build_app, output_sources, query_settings  # noqa: E402
+
+
+def write_profits(directory: Path) -> Path:
+    profits = pd.DataFrame({
+        'Fund': ['AAA', 'BBB', 'CCC', 'DDD'],
+        'Full Fund Name': ['AAA FUND', 'BBB FUND', 'CCC ALTIN FUND', 'DDD FUND'],
+        '2 Weeks': [4.0, 3.0, 2.0, 1.0],
+        '4 Weeks': [1.0, 2.0, 3.0, 4.0],
+        '12 Weeks': [2.5, 1.5, 3.5, 0.5],
+    })
+    path = directory / 'all_fund_profit_percentages_api_2026-10-18_14-36-31.csv'
+    profits.to_csv(path, index=False)
+    return path
+
+
+def test_query_settings_drop_repeated_weeks():
+    assert query_settings({'weeks': '4,2,2,4'})['weeks'] == [2, 4]
+
+
+def test_overlap_with_repeated_weeks(tmp_path):
+    path = write_profits(tmp_path)
+    snapshot = Snapshot(path)
+    assert snapshot.overlap([2, 2, 4], 2, 1, [], None) == snapshot.overlap([2, 4], 2, 1, [], None)
+
+    async def request():
+        server = QueryServer(tmp_path, None)
+        sources = output_sources(tmp_path, None)
+        server.swap(server.load(sources), sources)
+        async with TestClient(TestServer(build_app(server))) as client:
+            response = await client.get('/overlap', params={'weeks': '2,2,4', 'top': '5', 'min': '1'})
+            return response.status, await response.json()
+
+    status, body = asyncio.run(request())
+    assert status == 200
+    assert body['weeks'] == [2, 4]
+    assert [fund['fund'] for fund in body['funds']] == ['AAA', 'BBB', 'CCC', 'DDD']